@@ -0,0 +1,213 @@
+"""Benchmarks for treelog.
+
+Run as ``python -m benchmark`` to print the time per operation of every case,
+optionally restricted to cases whose name contains a given substring. With
+``--json`` the results are additionally saved in machine readable form, and
+with ``--compare`` they are compared against previously saved results.
+
+Every case is a generator that sets up its environment, yields the operation
+to be timed and tears down when closed.
+
+The startup cases time a fresh interpreter; the cost of importing treelog
+follows from comparing them against ``startup[python]``, and is broken down
+per module by ``python -X importtime -c "import treelog; treelog.info"``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+import treelog
+
+from treelog.proto import Level
+
+
+def tee(nsinks):
+    "dispatch cost of TeeLog as a function of the number of sinks"
+
+    log = treelog.TeeLog(*[treelog.NullLog() for i in range(nsinks)])
+    yield lambda: log.write("msg", Level.info)
+
+
+def tee_added(nsinks):
+    "dispatch cost of a TeeLog built up pairwise, as by repeated treelog.add"
+
+    log = treelog.NullLog()
+    for i in range(nsinks - 1):
+        log = treelog.TeeLog(log, treelog.NullLog())
+    yield lambda: log.write("msg", Level.info)
+
+
+def chain(level):
+    "cost of a message through a filtered composition like the default logger"
+
+    f = getattr(treelog, level)
+    with open(os.devnull, "w") as devnull:
+        log = treelog.TeeLog(treelog.StdoutLog(devnull), treelog.NullLog())
+        with treelog.set(treelog.FilterLog(log, minlevel=Level.info)):
+            yield lambda: f("msg")
+
+
+def stdout(depth):
+    "cost of a StdoutLog message as a function of context depth"
+
+    with open(os.devnull, "w") as devnull:
+        log = treelog.StdoutLog(devnull)
+        for i in range(depth):
+            log.pushcontext(f"context {i}")
+        yield lambda: log.write("msg", Level.info)
+
+
+def startup(statement):
+    "cost of starting a python interpreter that executes statement"
+
+    path = os.path.dirname(os.path.dirname(os.path.abspath(treelog.__file__)))
+    env = dict(os.environ, PYTHONPATH=path)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        args = [sys.executable, "-c", statement]
+        yield lambda: subprocess.run(
+            args, cwd=tmpdir, env=env, stdout=subprocess.DEVNULL, check=True
+        )
+
+
+statements = {
+    "python": "pass",
+    "import": "import treelog",
+    "attr": "import treelog; treelog.info",
+    "info": "import treelog; treelog.info('msg')",
+}
+
+
+sinks = {
+    "stdout": lambda tmpdir, devnull: treelog.StdoutLog(devnull),
+    "richoutput": lambda tmpdir, devnull: treelog.RichOutputLog(devnull),
+    "html": lambda tmpdir, devnull: treelog.HtmlLog(tmpdir),
+    "data": lambda tmpdir, devnull: treelog.DataLog(tmpdir),
+    "record": lambda tmpdir, devnull: treelog.RecordLog(),
+    "null": lambda tmpdir, devnull: treelog.NullLog(),
+}
+
+
+def sink(op, name, *args):
+    "cost of a treelog operation with the given sink, filtered at level info"
+
+    with tempfile.TemporaryDirectory() as tmpdir, open(os.devnull, "w") as devnull:
+        log = sinks[name](tmpdir, devnull)
+        try:
+            with treelog.set(treelog.FilterLog(log, minlevel=Level.info)):
+                with treelog.context("benchmark"):
+                    yield ops[op](*args)
+        finally:
+            # run closes the case generator, raising GeneratorExit at the yield
+            if hasattr(log, "close"):
+                log.close()
+
+
+def _context():
+    with treelog.context("context"):
+        pass
+
+
+def _fraction(n):
+    for i in treelog.iter.fraction("iter", range(n)):
+        pass
+
+
+def _file(data):
+    with treelog.infofile("file.dat", "wb") as f:
+        f.write(data)
+
+
+ops = {
+    "info": lambda: lambda: treelog.info("msg"),
+    "debug": lambda: lambda: treelog.debug("msg"),
+    "context": lambda: _context,
+    "fraction": lambda n: lambda: _fraction(n),
+    "data": lambda size: lambda data=bytes(size): treelog.infodata("file.dat", data),
+    "file": lambda size: lambda data=bytes(size): _file(data),
+}
+
+# name: case, arguments, maximum number of operations per timing
+cases = {
+    **{
+        f"{f.__name__}[{nsinks}]": (f, (nsinks,), None)
+        for f in (tee, tee_added)
+        for nsinks in (1, 2, 5, 10)
+    },
+    **{f"chain[{level}]": (chain, (level,), None) for level in ("debug", "info")},
+    **{f"stdout[{depth}]": (stdout, (depth,), None) for depth in (0, 5, 20)},
+    **{f"startup[{name}]": (startup, (stmt,), 16) for name, stmt in statements.items()},
+    **{
+        f"{op}[{name}]": (sink, (op, name), None)
+        for op in ("info", "debug", "context")
+        for name in sinks
+    },
+    **{f"fraction100[{name}]": (sink, ("fraction", name, 100), None) for name in sinks},
+    **{
+        f"{op}{unit}[{name}]": (sink, (op, name, size), 2**26 // size)
+        for op in ("data", "file")
+        for unit, size in (("1k", 2**10), ("1M", 2**20))
+        for name in sinks
+    },
+}
+
+
+def run(f, args, maxnumber=None, repeat=5):
+    """Return the best time per operation of a case, in seconds.
+
+    The number of operations per timing is doubled until a timing takes at
+    least 0.2 seconds or ``maxnumber`` is reached, which bounds the disk and
+    memory usage of cases with large payloads."""
+
+    setup = f(*args)
+    try:
+        timer = timeit.Timer(next(setup))
+        number = 1
+        while timer.timeit(number) < 0.2 and (maxnumber is None or number < maxnumber):
+            number *= 2
+        best = min(timer.repeat(repeat=repeat, number=number)) / number
+    finally:
+        setup.close()
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark")
+    parser.add_argument("filter", nargs="?", default="", help="substring of names")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timings")
+    parser.add_argument("--json", help="save results to this file")
+    parser.add_argument("--compare", help="compare against results in this file")
+    args = parser.parse_args(argv)
+    reference = {}
+    if args.compare:
+        with open(args.compare) as f:
+            reference = json.load(f)["results"]
+    results = {}
+    for name, (f, fargs, maxnumber) in cases.items():
+        if args.filter not in name:
+            continue
+        results[name] = best = run(f, fargs, maxnumber, args.repeat)
+        line = f"{name:30s} {best * 1e9:12.1f} ns"
+        if name in reference:
+            line += f" {best / reference[name]:8.2f}x"
+        print(line, flush=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "python": sys.version,
+                    "platform": platform.platform(),
+                    "treelog": treelog.__version__,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
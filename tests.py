@@ -18,16 +18,29 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import asyncio
+import concurrent.futures
+import contextlib
 import doctest
 import gc
 import io
+import json
+import logging
+import logging.handlers
+import multiprocessing
 import os
+import queue
+import subprocess
+import sys
 import tempfile
+import threading
+import time
 import treelog
 import unittest
+import unittest.mock
 import warnings
 
-from treelog import _path, _state
+from treelog import _file, _path, _record, _state, _timing
 from treelog.proto import Level, Data
 
 
@@ -67,6 +80,17 @@ def generate():
     treelog.warning("warn")
 
 
+@treelog.withcontext
+def square(x):
+    "logged function for parallel mapping"
+
+    time.sleep(0.01 / (1 + hash(x) % 3))
+    treelog.info(x)
+    if isinstance(x, str):
+        raise ZeroDivisionError
+    return x**2
+
+
 class StdoutLog(unittest.TestCase):
     def test_output(self):
         f = io.StringIO()
@@ -95,11 +119,71 @@ class StdoutLog(unittest.TestCase):
             "warn\n",
         )
 
+    def test_prefix(self):
+        f = io.StringIO()
+        log = treelog.StdoutLog(f)
+        log.pushcontext("a")
+        log.write("x", Level.info)
+        log.pushcontext("b")
+        log.recontext("bb")
+        log.write("y\nz", Level.info)
+        log.popcontext()
+        log.write("x", Level.info)
+        log.popcontext()
+        log.write("x", Level.info)
+        self.assertEqual(f.getvalue(), "a > x\na > bb > y\n       > z\na > x\nx\n")
+
+    def test_buffered(self):
+        f = io.StringIO()
+        with treelog.set(treelog.StdoutLog(f, bufsize=1000)) as log:
+            generate()
+            log.flush()
+        self.check_output(f)
+
+    def test_flush(self):
+        f = io.StringIO()
+        log = treelog.StdoutLog(f, bufsize=10)
+        log.write("a", Level.info)
+        self.assertEqual(f.getvalue(), "")
+        log.write("b", Level.warning)
+        self.assertEqual(f.getvalue(), "a\nb\n")
+        log.pushcontext("c")
+        log.write("d", Level.info)
+        self.assertEqual(f.getvalue(), "a\nb\n")
+        log.write("e", Level.info)
+        self.assertEqual(f.getvalue(), "a\nb\nc > d\nc > e\n")
+        log.write("f", Level.info)
+        log.popcontext()
+        self.assertEqual(f.getvalue(), "a\nb\nc > d\nc > e\nc > f\n")
+        log.write("g", Level.info)
+        del log
+        gc.collect()
+        self.assertEqual(f.getvalue(), "a\nb\nc > d\nc > e\nc > f\ng\n")
+
+    def test_flushinterval(self):
+        f = io.StringIO()
+        log = treelog.StdoutLog(f, bufsize=1000, flushinterval=0)
+        log.write("a", Level.info)
+        self.assertEqual(f.getvalue(), "a\n")
+
+    def test_flushtimer(self):
+        f = io.StringIO()
+        log = treelog.StdoutLog(f, bufsize=1000, flushinterval=0.05)
+        log.write("a", Level.info)
+        log.write("b", Level.info)
+        self.assertEqual(f.getvalue(), "")
+        for i in range(100):
+            if f.getvalue():
+                break
+            time.sleep(0.01)
+        self.assertEqual(f.getvalue(), "a\nb\n")
+        self.assertIsNone(log._timer)
+
 
 class RichOutputLog(unittest.TestCase):
     def test_output(self):
         f = io.StringIO()
-        with treelog.set(treelog.RichOutputLog(f)):
+        with treelog.set(treelog.RichOutputLog(f, redrawinterval=0)):
             generate()
         self.check_output(f)
 
@@ -144,6 +228,30 @@ class RichOutputLog(unittest.TestCase):
             "\x1b[1;35mwarn\x1b[0m\n",
         )
 
+    def test_coalesce(self):
+        f = io.StringIO()
+        log = treelog.RichOutputLog(f, redrawinterval=3600)
+        log.pushcontext("a")
+        log.pushcontext("b")
+        log.recontext("c")
+        self.assertEqual(f.getvalue(), "a > ")
+        log.write("x", Level.info)
+        log.popcontext()
+        log.popcontext()
+        self.assertEqual(f.getvalue(), "a > c > \x1b[1mx\x1b[0m\na > c > \r\x1b[K")
+
+    def test_deferred(self):
+        f = io.StringIO()
+        log = treelog.RichOutputLog(f, redrawinterval=0.01)
+        log.pushcontext("a")
+        log.pushcontext("b")
+        self.assertEqual(f.getvalue(), "a > ")
+        for i in range(100):
+            if f.getvalue() != "a > ":
+                break
+            time.sleep(0.01)
+        self.assertEqual(f.getvalue(), "a > b > ")
+
 
 class DataLog(unittest.TestCase):
     def test_output(self):
@@ -168,6 +276,117 @@ class DataLog(unittest.TestCase):
         with open(os.path.join(tmpdir, "dbg.jpg"), "r") as f:
             self.assertEqual(f.read(), "test4")
 
+    def test_async(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with treelog.DataLog(tmpdir, workers=2, maxinflight=8) as datalog:
+                with treelog.set(datalog):
+                    generate()
+            self.check_output(tmpdir)
+
+    def test_openfile(self):
+        with (
+            tempfile.TemporaryDirectory() as tmpa,
+            tempfile.TemporaryDirectory() as tmpb,
+        ):
+            recordlog = treelog.RecordLog()
+            log = treelog.TeeLog(
+                treelog.DataLog(tmpa), recordlog, treelog.DataLog(tmpb)
+            )
+            with treelog.set(log):
+                generate()
+                with self.assertRaises(ZeroDivisionError):
+                    with treelog.userfile("error.dat", "wb") as f:
+                        f.write(b"partial")
+                        1 / 0
+            self.check_output(tmpa)
+            self.check_output(tmpb)
+        self.assertIn(
+            ("write", Data("dbg.jpg", b"test4", "image/jpg"), Level.debug),
+            recordlog._messages,
+        )
+
+    def test_openfile_subdir(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.mkdir(os.path.join(tmpdir, "sub"))
+            with treelog.set(treelog.DataLog(tmpdir)):
+                with treelog.infofile("sub/x.txt", "w") as f:
+                    f.write("test")
+            self.assertEqual(os.listdir(tmpdir), ["sub"])
+            with open(os.path.join(tmpdir, "sub", "x.txt")) as f:
+                self.assertEqual(f.read(), "test")
+
+    def test_openfile_nolink(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with unittest.mock.patch("treelog._data.link", side_effect=OSError):
+                with treelog.set(treelog.DataLog(tmpdir)):
+                    for i in range(2):
+                        with treelog.infofile("x.dat", "wb") as f:
+                            f.write(b"x%d" % i)
+            self.assertEqual(sorted(os.listdir(tmpdir)), ["x-1.dat", "x.dat"])
+            with open(os.path.join(tmpdir, "x-1.dat"), "rb") as f:
+                self.assertEqual(f.read(), b"x1")
+
+    def test_dedup(self):
+        for workers in 0, 2:
+            with self.subTest(workers=workers), tempfile.TemporaryDirectory() as tmpdir:
+                datalog = treelog.DataLog(tmpdir, workers=workers, dedup=True)
+                with datalog, treelog.set(datalog):
+                    generate()
+                store = os.path.join(tmpdir, ".store")
+                self.assertEqual(len(os.listdir(store)), 4)
+                for name in os.listdir(store):
+                    os.unlink(os.path.join(store, name))
+                os.rmdir(store)
+                self.check_output(tmpdir)
+                inode = lambda name: os.stat(os.path.join(tmpdir, name)).st_ino
+                self.assertEqual(inode("same.dat"), inode("test-2.dat"))
+                self.assertNotEqual(inode("test.dat"), inode("test-1.dat"))
+
+    def test_dedup_nolink(self):
+        for workers in 0, 2:
+            with self.subTest(workers=workers), tempfile.TemporaryDirectory() as tmpdir:
+                datalog = treelog.DataLog(tmpdir, workers=workers, dedup=True)
+                with unittest.mock.patch("treelog._data.link", side_effect=OSError):
+                    with datalog, treelog.set(datalog):
+                        for i in range(3):
+                            treelog.infodata("y.dat", b"y")
+                        with treelog.infofile("y.dat", "wb") as f:
+                            f.write(b"y")
+                self.assertEqual(os.listdir(os.path.join(tmpdir, ".store")), [])
+                self.assertEqual(
+                    sorted(os.listdir(tmpdir)),
+                    [".store", "y-1.dat", "y-2.dat", "y-3.dat", "y.dat"],
+                )
+                for name in "y.dat", "y-1.dat", "y-2.dat", "y-3.dat":
+                    with open(os.path.join(tmpdir, name), "rb") as f:
+                        self.assertEqual(f.read(), b"y")
+
+    def test_async_error(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            datalog = treelog.DataLog(tmpdir, workers=1)
+            datalog.write(Data("dat", "not bytes"), Level.info)
+            with self.assertRaises(TypeError):
+                datalog.flush()
+            datalog.write(Data("dat", b"bytes"), Level.info)
+            datalog.close()
+            self.assertEqual(sorted(os.listdir(tmpdir)), ["dat", "dat-1"])
+
+    @unittest.skipUnless(os.path.isdir("/proc/self/fd"), "cannot count descriptors")
+    def test_async_descriptors(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with treelog.DataLog(tmpdir, workers=1) as datalog:
+                event = threading.Event()
+                datalog._executor.submit(event.wait)
+                try:
+                    nfds = len(os.listdir("/proc/self/fd"))
+                    for i in range(100):
+                        datalog.write(Data("dat", b"%d" % i), Level.info)
+                    self.assertLess(len(os.listdir("/proc/self/fd")), nfds + 10)
+                finally:
+                    event.set()
+            with open(os.path.join(tmpdir, "dat-99"), "rb") as f:
+                self.assertEqual(f.read(), b"99")
+
     @unittest.skipIf(not _path.supports_fd, "dir_fd not supported on platform")
     def test_move_outdir(self):
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -272,6 +491,100 @@ class HtmlLog(unittest.TestCase):
                 pass
             self.assertTrue(os.path.exists(os.path.join(tmpdir, "log-2.html")))
 
+    def test_openfile_subdir(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with treelog.HtmlLog(tmpdir) as htmllog, treelog.set(htmllog):
+                with treelog.infofile("sub/x.txt", "w") as f:
+                    f.write("test")
+            self.assertIn(
+                "a94a8fe5ccb19ba61c4c0873d391e987982fbbd3.txt", os.listdir(tmpdir)
+            )
+            with open(os.path.join(tmpdir, "log.html")) as f:
+                self.assertIn(
+                    '<a href="a94a8fe5ccb19ba61c4c0873d391e987982fbbd3.txt" download="sub/x.txt">sub/x.txt</a>',
+                    f.read(),
+                )
+            self.assertFalse([n for n in os.listdir(tmpdir) if "partial" in n])
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with treelog.HtmlLog(tmpdir, resume=True) as log:
+                log.pushcontext("a")
+                log.write("x", Level.info)
+                log.close()
+            with open(os.path.join(tmpdir, "log.html")) as f:
+                head = f.read().split('<div id="log">\n')[0]
+            with treelog.HtmlLog(tmpdir, title="ignored", resume=True) as log:
+                log.write("y", Level.info)
+            self.assertEqual(log.filename, "log.html")
+            with open(os.path.join(tmpdir, "log.html")) as f:
+                self.assertEqual(
+                    f.read(),
+                    head + '<div id="log">\n'
+                    '<div class="context"><div class="title">a</div><div class="children">\n'
+                    '<div class="item" data-loglevel="1">x</div>\n'
+                    '</div><div class="end"></div></div>\n'
+                    '<div class="item" data-loglevel="1">y</div>\n'
+                    "</div></body></html>\n",
+                )
+
+    def test_resume_interrupted(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log = treelog.HtmlLog(tmpdir)
+            log.pushcontext("a")
+            log.write("x", Level.info)
+            log.pushcontext("b")
+            log.write("y", Level.info)
+            log.pushcontext("c")
+            # interrupt while writing, leaving a partial line and no footer
+            log._file.write('<div class="context"><div class="tit')
+            log._file.close()
+            path = os.path.join(tmpdir, "log.html")
+            with open(path) as f:
+                head = f.read().split('<div id="log">\n')[0]
+            with self.assertWarns(UserWarning):
+                log = treelog.HtmlLog(tmpdir, resume=True)
+            with log:
+                log.write("z", Level.info)
+            self.assertEqual(log.filename, "log.html")
+            with open(path) as f:
+                self.assertEqual(
+                    f.read(),
+                    head + '<div id="log">\n'
+                    '<div class="context"><div class="title">a</div><div class="children">\n'
+                    '<div class="item" data-loglevel="1">x</div>\n'
+                    '<div class="context"><div class="title">b</div><div class="children">\n'
+                    '<div class="item" data-loglevel="1">y</div>\n'
+                    '</div><div class="end"></div></div>\n'
+                    '</div><div class="end"></div></div>\n'
+                    '<div class="item" data-loglevel="1">z</div>\n'
+                    "</div></body></html>\n",
+                )
+
+    def test_assetdir(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            assetdir = os.path.join(tmpdir, "assets")
+            for name in "a", "b c":
+                outdir = os.path.join(tmpdir, "logs", name)
+                with treelog.HtmlLog(outdir, assetdir=assetdir):
+                    pass
+                self.assertEqual(os.listdir(outdir), ["log.html"])
+                with open(os.path.join(outdir, "log.html")) as f:
+                    html = f.read()
+                assets = os.listdir(assetdir)
+                self.assertEqual(
+                    sorted(os.path.splitext(a)[1] for a in assets), [".css", ".js"]
+                )
+                for asset in assets:
+                    self.assertIn(f'"../../assets/{asset}"', html)
+            with treelog.HtmlLog(assetdir, assetdir=assetdir):
+                pass
+            self.assertEqual(set(os.listdir(assetdir)), {"log.html", *assets})
+            with open(os.path.join(assetdir, "log.html")) as f:
+                html = f.read()
+            for asset in assets:
+                self.assertIn(f'"{asset}"', html)
+
 
 class RecordLog(unittest.TestCase):
     simplify = False
@@ -295,7 +608,7 @@ class RecordLog(unittest.TestCase):
         if not self.simplify:
             with self.subTest("replay to RichOutputLog"):
                 f = io.StringIO()
-                recordlog.replay(treelog.RichOutputLog(f))
+                recordlog.replay(treelog.RichOutputLog(f, redrawinterval=0))
                 RichOutputLog.check_output(self, f)
 
     def check_output(self, messages):
@@ -386,13 +699,79 @@ class SimplifiedRecordLog(RecordLog):
         )
 
 
+class MergeRecordLog(unittest.TestCase):
+    def record(self, *msgs):
+        recordlog = treelog.RecordLog()
+        for msg in msgs:
+            recordlog.write(msg, Level.info)
+        return recordlog
+
+    def test_titles(self):
+        recordlog = treelog.RecordLog(simplify=False)
+        treelog.RecordLog.merge(
+            [self.record("a"), self.record("b", "c")], ["x", "y"], recordlog
+        )
+        self.assertEqual(
+            recordlog._messages,
+            [
+                ("pushcontext", "x"),
+                ("write", "a", Level.info),
+                ("popcontext",),
+                ("pushcontext", "y"),
+                ("write", "b", Level.info),
+                ("write", "c", Level.info),
+                ("popcontext",),
+            ],
+        )
+
+    def test_length(self):
+        recordlog = treelog.RecordLog(simplify=False)
+        with self.assertRaises(ValueError):
+            treelog.RecordLog.merge(
+                [self.record("a"), self.record("b")], ["x"], recordlog
+            )
+        self.assertEqual(
+            recordlog._messages,
+            [("pushcontext", "x"), ("write", "a", Level.info), ("popcontext",)],
+        )
+        with self.assertRaises(ValueError):
+            treelog.RecordLog.merge([self.record("a")], ["x", "y"], recordlog)
+
+    def test_futures(self):
+        release = threading.Event()
+
+        def work(msg):
+            if msg == "a":
+                release.wait()
+            return self.record(msg)
+
+        recordlog = treelog.RecordLog(simplify=False)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(work, msg) for msg in "ab"]
+            futures[1].result()
+            release.set()
+            with treelog.set(recordlog):
+                treelog.RecordLog.merge(futures, "worker")
+        self.assertEqual(
+            recordlog._messages,
+            [
+                ("pushcontext", "worker 1"),
+                ("write", "a", Level.info),
+                ("popcontext",),
+                ("pushcontext", "worker 2"),
+                ("write", "b", Level.info),
+                ("popcontext",),
+            ],
+        )
+
+
 class TeeLog(unittest.TestCase):
     def test_output(self):
         f = io.StringIO()
         with tempfile.TemporaryDirectory() as tmpdir:
             datalog = treelog.DataLog(tmpdir)
             recordlog = treelog.RecordLog(simplify=False)
-            richoutputlog = treelog.RichOutputLog(f)
+            richoutputlog = treelog.RichOutputLog(f, redrawinterval=0)
             with treelog.set(
                 treelog.TeeLog(richoutputlog, treelog.TeeLog(datalog, recordlog))
             ):
@@ -413,6 +792,19 @@ class TeeLog(unittest.TestCase):
             with open(os.path.join(tmpdir, "test-1"), "rb") as f:
                 self.assertEqual(f.read(), b"test")
 
+    def test_many(self):
+        recordlogs = [treelog.RecordLog(simplify=False) for i in range(3)]
+        with treelog.set(treelog.TeeLog(*recordlogs)):
+            generate()
+        for recordlog in recordlogs:
+            RecordLog.check_output(self, recordlog._messages)
+
+    def test_flatten(self):
+        a, b, c = treelog.NullLog(), treelog.NullLog(), treelog.NullLog()
+        self.assertEqual(treelog.TeeLog(treelog.TeeLog(a, b), c)._baselogs, (a, b, c))
+        with treelog.set(a), treelog.add(b), treelog.add(c):
+            self.assertEqual(_state.current._baselogs, (a, b, c))
+
 
 class FilterMinLog(unittest.TestCase):
     def test_output(self):
@@ -511,6 +903,176 @@ class FilterMinMaxLog(unittest.TestCase):
         )
 
 
+class Dispatch(unittest.TestCase):
+    def test_flatten(self):
+        a, b = treelog.RecordLog(simplify=False), treelog.RecordLog(simplify=False)
+        dispatch = _state.Dispatch(
+            treelog.FilterLog(
+                treelog.TeeLog(
+                    a, treelog.FilterLog(b, minlevel=Level.warning), treelog.NullLog()
+                ),
+                minlevel=Level.info,
+            )
+        )
+        self.assertEqual(dispatch.writers[Level.debug.value], ())
+        self.assertEqual(dispatch.writers[Level.info.value], (a.write,))
+        self.assertEqual(dispatch.writers[Level.error.value], (a.write, b.write))
+        dispatch.pushcontext("x")
+        dispatch.write("y", Level.info)
+        dispatch.popcontext()
+        self.assertEqual(
+            a._messages,
+            [("pushcontext", "x"), ("write", "y", Level.info), ("popcontext",)],
+        )
+        self.assertEqual(b._messages, [("pushcontext", "x"), ("popcontext",)])
+
+    def test_set(self):
+        recordlog = treelog.RecordLog()
+        with treelog.set(treelog.FilterLog(recordlog, minlevel=Level.user)):
+            self.assertEqual(_state.dispatch.writers[Level.info.value], ())
+            treelog.info("x")
+            treelog.user("y")
+        self.assertEqual(recordlog._messages, [("write", "y", Level.user)])
+
+    def test_lazy(self):
+        recordlog = treelog.RecordLog(simplify=False)
+        dispatch = _state._LazyDispatch(treelog.FilterLog(recordlog, Level.info))
+        self.assertNotIn("writers", vars(dispatch))
+        self.assertFalse(hasattr(dispatch, "__wrapped__"))
+        self.assertNotIn("writers", vars(dispatch))
+        dispatch.write("x", Level.info)
+        self.assertEqual(dispatch.writers[Level.info.value], (recordlog.write,))
+        self.assertEqual(dispatch.logs[Level.debug.value], ())
+        self.assertEqual(recordlog._messages, [("write", "x", Level.info)])
+
+    def test_default(self):
+        default = _state._DefaultLog()
+        self.assertIsNone(default._log)
+        dispatch = _state.Dispatch(default)
+        self.assertIsInstance(default._log, treelog.FilterLog)
+        self.assertEqual(dispatch.writers[Level.debug.value], ())
+        self.assertEqual(len(dispatch.writers[Level.info.value]), 2)
+
+    def test_import(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    "import sys, treelog; treelog.info; "
+                    "assert 'treelog._data' not in sys.modules",
+                ],
+                cwd=tmpdir,
+                env=dict(os.environ, PYTHONPATH=os.path.dirname(treelog.__path__[0])),
+                check=True,
+            )
+
+
+class Profile(unittest.TestCase):
+    def test_summary(self):
+        a, b = treelog.RecordLog(), treelog.RecordLog()
+        with (
+            treelog.profile() as profile,
+            treelog.set(treelog.TeeLog(a, treelog.FilterLog(b, minlevel=Level.user))),
+        ):
+            generate()
+        lines = profile.summary().splitlines()
+        self.assertEqual(lines[0], " time [s]     count   mean [us]  method")
+        counts = {line.split()[-1]: int(line.split()[1]) for line in lines[1:]}
+        self.assertEqual(counts["RecordLog#1.pushcontext"], 9)
+        self.assertEqual(counts["RecordLog#2.pushcontext"], 9)
+        # files are streamed via openfile, the remaining messages written
+        self.assertEqual(
+            counts["RecordLog#1.write"] + counts["RecordLog#1.openfile"], 15
+        )
+        self.assertEqual(
+            counts["RecordLog#2.write"] + counts["RecordLog#2.openfile"], 6
+        )
+        self.assertEqual(counts["RecordLog#1.openfile"], 4)
+        self.assertEqual(counts["RecordLog#2.openfile"], 2)
+
+    def test_restore(self):
+        recordlog = treelog.RecordLog()
+        with treelog.set(recordlog):
+            with treelog.profile() as profile:
+                treelog.info("x")
+            treelog.info("y")
+        self.assertEqual(recordlog._messages[-1], ("write", "y", Level.info))
+        self.assertEqual(len(profile.summary().splitlines()), 2)
+
+
+class Spool(unittest.TestCase):
+    def test_rollover(self):
+        with _file._Spool(4) as f:
+            f.write(b"abc")
+            self.assertFalse(f._rolled)
+            f.write(b"defg")
+            self.assertTrue(f._rolled)
+            f.seek(0)
+            self.assertEqual(f.read(), b"abcdefg")
+
+    def test_spoolsize(self):
+        recordlog = treelog.RecordLog()
+        with treelog.set(recordlog, spoolsize=4):
+            self.assertEqual(_state._spoolsize, 4)
+            with treelog.infofile("test.txt", "w") as f:
+                f.write("test1")
+                f.write("test2")
+        self.assertEqual(_state._spoolsize, 2**20)
+        self.assertEqual(
+            recordlog._messages,
+            [("write", Data("test.txt", b"test1test2"), Level.info)],
+        )
+
+
+class OpenFile(unittest.TestCase):
+    class StreamLog(treelog.NullLog):
+        "log that accepts data as a non-seekable stream"
+
+        def __init__(self):
+            self.chunks = []
+
+        @contextlib.contextmanager
+        def openfile(self, name, level, type=None):
+            f = _file._MultiFile([])
+            f.write = lambda b: self.chunks.append(bytes(b)) or len(b)
+            yield f
+
+    def test_stream(self):
+        streamlog = self.StreamLog()
+        stdout = io.StringIO()
+        recordlog = treelog.RecordLog()
+        log = treelog.TeeLog(
+            streamlog,
+            treelog.FilterLog(treelog.StdoutLog(stdout), minlevel=Level.user),
+            treelog.FilterLog(recordlog, maxlevel=Level.debug),
+        )
+        with log.openfile("a.dat", Level.user) as f:
+            f.write(b"ab")
+            f.write(b"cd")
+        self.assertEqual(streamlog.chunks, [b"ab", b"cd"])
+        self.assertEqual(stdout.getvalue(), "a.dat [4 bytes]\n")
+        self.assertEqual(recordlog._messages, [])
+
+    def test_error(self):
+        recordlog = treelog.RecordLog()
+        with self.assertRaises(ZeroDivisionError):
+            with treelog.TeeLog(recordlog).openfile("a.dat", Level.user) as f:
+                f.write(b"ab")
+                1 / 0
+        self.assertEqual(recordlog._messages, [])
+
+    def test_html(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with treelog.HtmlLog(tmpdir) as htmllog:
+                with htmllog.openfile("a.dat", Level.user) as f:
+                    f.write(b"abcd")
+            self.assertIn(
+                "81fe8bfe87576c3ecb22426f8e57847382917acf.dat", os.listdir(tmpdir)
+            )
+            self.assertFalse([name for name in os.listdir(tmpdir) if "partial" in name])
+
+
 class LoggingLog(unittest.TestCase):
     def test_output(self):
         with self.assertLogs("nutils") as cm, treelog.set(treelog.LoggingLog()):
@@ -537,6 +1099,303 @@ class LoggingLog(unittest.TestCase):
             ],
         )
 
+    def test_context(self):
+        with self.assertLogs("nutils") as cm, treelog.set(treelog.LoggingLog()):
+            with treelog.context("a"), treelog.context("b"):
+                treelog.info("x")
+        self.assertEqual(cm.records[0].context, ("a", "b"))
+
+    def test_disabled(self):
+        class Msg:
+            def __str__(self):
+                raise AssertionError("message should not be formatted")
+
+        log = treelog.LoggingLog()
+        with self.assertLogs("nutils", logging.WARNING) as cm:
+            log.write(Msg(), Level.info)
+            log.write("x", Level.warning)
+        self.assertEqual(cm.output, ["WARNING:nutils:x"])
+
+    def test_queue(self):
+        q = queue.SimpleQueue()
+        logger = logging.getLogger("treelog.queue")
+        logger.addHandler(logging.handlers.QueueHandler(q))
+        logger.setLevel(logging.INFO)
+        try:
+            with treelog.set(treelog.LoggingLog("treelog.queue")):
+                with treelog.context("a"):
+                    treelog.info("x")
+                treelog.info("y")
+        finally:
+            logger.handlers.clear()
+        records = [q.get_nowait(), q.get_nowait()]
+        self.assertEqual([r.getMessage() for r in records], ["a > x", "y"])
+        self.assertEqual([r.context for r in records], [("a",), ()])
+
+
+class TimingLog(unittest.TestCase):
+    def setUp(self):
+        self.timinglog = treelog.TimingLog()
+        with treelog.set(self.timinglog):
+            generate()
+
+    def test_report(self):
+        lines = self.timinglog.report().splitlines()
+        self.assertEqual(lines[0], " wall [s]   cpu [s]   count")
+        self.assertEqual(
+            sorted(line[20:] for line in lines[1:]),
+            sorted(
+                [
+                    "      1  test.dat",
+                    "      1  my context",
+                    "      1    iter 0",
+                    "      1    iter 1",
+                    "      1    iter 2",
+                    "      1    iter 3",
+                    "      1    empty",
+                    "      1    test.dat",
+                    "      1  generate_test",
+                    "      1    test.dat",
+                    "      1  context step=0",
+                    "      1  context step=1",
+                    "      1  dbg.jpg",
+                ]
+            ),
+        )
+
+    def test_collapsed(self):
+        lines = self.timinglog.collapsed().splitlines()
+        self.assertEqual(len(lines), 13)
+        self.assertIn("my context;iter 1", [line.rsplit(" ", 1)[0] for line in lines])
+        for line in lines:
+            self.assertRegex(line, r" \d+$")
+
+    def test_speedscope(self):
+        data = json.loads(self.timinglog.speedscope())
+        frames = [frame["name"] for frame in data["shared"]["frames"]]
+        self.assertEqual(len(frames), 11)
+        self.assertEqual(
+            [profile["name"] for profile in data["profiles"]], ["wall time", "cpu time"]
+        )
+        for profile in data["profiles"]:
+            self.assertEqual(len(profile["samples"]), 13)
+            self.assertEqual(len(profile["weights"]), 13)
+
+
+class TraceLog(unittest.TestCase):
+    def test_output(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with treelog.TraceLog(tmpdir) as tracelog, treelog.set(tracelog):
+                generate()
+            self.assertEqual(tracelog.filename, "trace.json")
+            with open(os.path.join(tmpdir, "trace.json")) as f:
+                events = json.load(f)
+        self.assertEqual(
+            [(event["ph"], event.get("name")) for event in events],
+            [
+                ("M", "thread_name"),
+                ("i", "my message"),
+                ("B", "test.dat"),
+                ("E", None),
+                ("i", "test.dat"),
+                ("B", "my context"),
+                ("B", "iter 0"),
+                ("E", None),
+                ("B", "iter 1"),
+                ("i", "a"),
+                ("E", None),
+                ("B", "iter 2"),
+                ("i", "b"),
+                ("E", None),
+                ("B", "iter 3"),
+                ("i", "c"),
+                ("E", None),
+                ("B", "empty"),
+                ("E", None),
+                ("i", "multiple..\n  ..lines"),
+                ("B", "test.dat"),
+                ("i", "generating"),
+                ("E", None),
+                ("i", "test.dat"),
+                ("E", None),
+                ("B", "generate_test"),
+                ("B", "test.dat"),
+                ("E", None),
+                ("i", "test.dat"),
+                ("E", None),
+                ("B", "context step=0"),
+                ("i", "foo"),
+                ("E", None),
+                ("B", "context step=1"),
+                ("i", "bar"),
+                ("E", None),
+                ("i", "same.dat"),
+                ("B", "dbg.jpg"),
+                ("E", None),
+                ("i", "dbg.jpg"),
+                ("i", "dbg"),
+                ("i", "warn"),
+            ],
+        )
+        self.assertEqual(
+            events[-3]["args"], {"level": "debug", "type": "image/jpg", "size": 5}
+        )
+        self.assertEqual(len({(event["pid"], event["tid"]) for event in events}), 1)
+        timestamps = [event["ts"] for event in events[1:]]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_threads(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with treelog.TraceLog(tmpdir) as tracelog:
+                thread = threading.Thread(
+                    target=tracelog.write, args=("x", Level.info), name="worker"
+                )
+                thread.start()
+                thread.join()
+                tracelog.write("y", Level.info)
+            with open(os.path.join(tmpdir, "trace.json")) as f:
+                events = json.load(f)
+        self.assertEqual(
+            [event["args"]["name"] for event in events if event["ph"] == "M"],
+            ["worker", threading.current_thread().name],
+        )
+
+
+class MemoryLog(unittest.TestCase):
+    def check_output(self, method):
+        memorylog = treelog.MemoryLog(method)
+        self.addCleanup(memorylog.close)
+        with treelog.set(memorylog):
+            for i in treelog.iter.plain("iter", range(2)):
+                with treelog.context("alloc"):
+                    data = b"x" * 2**24
+                    treelog.info("allocated")
+                    del data
+        count, net, peak = memorylog._stats["iter 1", "alloc"]
+        self.assertEqual(count, 1)
+        self.assertGreaterEqual(peak, 2**24)
+        self.assertGreaterEqual(memorylog._stats["iter 1",][2], 2**24)
+        self.assertEqual(len(memorylog.report(n=2).splitlines()), 3)
+        self.assertIn("  iter 1 > alloc\n", memorylog.report())
+
+    def test_tracemalloc(self):
+        self.check_output("tracemalloc")
+
+    @unittest.skipIf(not os.path.exists("/proc/self/statm"), "statm not available")
+    def test_rss(self):
+        self.check_output("rss")
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            treelog.MemoryLog("invalid")
+
+
+class ThreadLog(unittest.TestCase):
+    def test_threads(self):
+        f = io.StringIO()
+        barrier = threading.Barrier(2)
+
+        def work():
+            with treelog.context("work"):
+                for i in range(2):
+                    treelog.info(i)
+                    barrier.wait()
+
+        with treelog.set(treelog.ThreadLog(treelog.StdoutLog(f))):
+            with treelog.context("main"):
+                threads = [
+                    threading.Thread(target=work, name=f"t{i}") for i in range(2)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                treelog.info("done")
+        lines = f.getvalue().splitlines()
+        self.assertEqual(lines[-1], "main > done")
+        self.assertEqual(
+            sorted([lines[0:2], lines[2:4]]),
+            [
+                ["main > t0 > work > 0", "main > t0 > work > 1"],
+                ["main > t1 > work > 0", "main > t1 > work > 1"],
+            ],
+        )
+
+    def test_nocontext(self):
+        recordlog = treelog.RecordLog(simplify=False)
+        log = treelog.ThreadLog(recordlog)
+        thread = threading.Thread(
+            target=log.write, args=("x", Level.info), name="thread"
+        )
+        thread.start()
+        thread.join()
+        self.assertEqual(
+            recordlog._messages,
+            [("pushcontext", "thread"), ("write", "x", Level.info), ("popcontext",)],
+        )
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "fork is not supported")
+class Fork(unittest.TestCase):
+    def fork(self, child):
+        pid = os.fork()
+        if not pid:
+            try:
+                child()
+            except BaseException:
+                os._exit(1)
+            os._exit(0)
+        self.assertEqual(os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]), 0)
+
+    def test_html(self):
+        def child():
+            assert _state.current is not log
+            treelog.debug("forked")
+            log.write("forked", Level.info)
+            log.popcontext()
+            log.close()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with treelog.HtmlLog(tmpdir, title="test") as log, treelog.set(log):
+                with treelog.context("context"):
+                    treelog.info("x")
+                    self.fork(child)
+                    treelog.info("y")
+            with open(os.path.join(tmpdir, log.filename)) as f:
+                html = f.read()
+        self.assertNotIn("forked", html)
+        self.assertEqual(html.count('<div class="end">'), 1)
+        self.assertTrue(
+            html.endswith(
+                '>y</div>\n</div><div class="end"></div></div>\n</div></body></html>\n'
+            )
+        )
+
+    def test_stdout(self):
+        with tempfile.TemporaryFile("w+") as f:
+            log = treelog.StdoutLog(f, bufsize=1000)
+            log.write("x", Level.info)
+            self.fork(log._finalize)
+            log.flush()
+            f.seek(0)
+            self.assertEqual(f.read(), "x\n")
+
+    def test_pmap(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with treelog.HtmlLog(tmpdir, title="test") as log, treelog.set(log):
+                with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=2,
+                    mp_context=multiprocessing.get_context("fork"),
+                ) as executor:
+                    items = treelog.iter.pmap(
+                        "square", square, [1, 2], executor=executor
+                    )
+                    self.assertEqual(list(items), [1, 4])
+            with open(os.path.join(tmpdir, log.filename)) as f:
+                html = f.read()
+        self.assertEqual(html.count("</html>"), 1)
+        self.assertIn('data-loglevel="1">2</div>', html)
+
 
 class NullLog(unittest.TestCase):
     def test_output(self):
@@ -669,6 +1528,18 @@ class Iter(unittest.TestCase):
             ("popcontext",),
         )
 
+    def test_throughput(self):
+        wrap = treelog.iter.fraction("test", "abc", throughput=True)
+        with wrap as items:
+            self.assertIsNone(wrap.rate)
+            self.assertEqual(list(items), list("abc"))
+            self.assertGreater(wrap.rate, 0)
+            self.assertGreaterEqual(wrap.eta, 0)
+        titles = [args[0] for cmd, *args in self.recordlog._messages[:4]]
+        self.assertEqual(titles[:2], ["test 0/3", "test 1/3"])
+        self.assertRegex(titles[2], r"^test 2/3 \(\S+/s, 0:00:00 left\)$")
+        self.assertRegex(titles[3], r"^test 3/3 \(\S+/s, 0:00:00 left\)$")
+
     def test_send(self):
         def titles():
             a = yield "value"
@@ -689,9 +1560,232 @@ class Iter(unittest.TestCase):
         )
 
 
+class PMap(unittest.TestCase):
+    def setUp(self):
+        self.recordlog = treelog.RecordLog(simplify=False)
+        c = treelog.set(self.recordlog)
+        c.__enter__()
+        self.addCleanup(c.__exit__, None, None, None)
+
+    def check(self, executor):
+        with executor:
+            results = list(
+                treelog.iter.pmap("item", square, [3, 2, 1], executor=executor)
+            )
+        self.assertEqual(results, [9, 4, 1])
+        self.assertEqual(
+            self.recordlog._messages,
+            [
+                ("pushcontext", "item 0/3"),
+                ("recontext", "item 1/3"),
+                ("pushcontext", "square"),
+                ("write", "3", Level.info),
+                ("popcontext",),
+                ("recontext", "item 2/3"),
+                ("pushcontext", "square"),
+                ("write", "2", Level.info),
+                ("popcontext",),
+                ("recontext", "item 3/3"),
+                ("pushcontext", "square"),
+                ("write", "1", Level.info),
+                ("popcontext",),
+                ("popcontext",),
+            ],
+        )
+
+    def test_threads(self):
+        self.check(concurrent.futures.ThreadPoolExecutor(max_workers=3))
+
+    def test_processes(self):
+        self.check(concurrent.futures.ProcessPoolExecutor(max_workers=2))
+
+    def test_exception(self):
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            with self.assertRaises(ZeroDivisionError):
+                for x in treelog.iter.pmap(
+                    "item", square, [1, 2, "x"], executor=executor
+                ):
+                    treelog.info("got", x)
+        self.assertEqual(
+            self.recordlog._messages[-5:],
+            [
+                ("recontext", "item 3/3"),
+                ("pushcontext", "square"),
+                ("write", "x", Level.info),
+                ("popcontext",),
+                ("popcontext",),
+            ],
+        )
+        self.assertIs(type(_state.dispatch), _state.Dispatch)
+
+    def test_maxinflight(self):
+        consumed = []
+
+        def count():
+            while True:
+                consumed.append(len(consumed))
+                yield consumed[-1]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            results = treelog.iter.pmap(
+                "item", square, count(), executor=executor, length=9, maxinflight=2
+            )
+            self.assertEqual([next(results) for i in range(3)], [0, 1, 4])
+            self.assertEqual(consumed, [0, 1, 2, 3, 4])
+            results.close()
+        self.assertEqual(self.recordlog._messages[0], ("pushcontext", "item 0/9"))
+        self.assertEqual(self.recordlog._messages[-1], ("popcontext",))
+
+    def test_add(self):
+        def work(n):
+            recordlog = treelog.RecordLog(simplify=False)
+            with treelog.add(recordlog):
+                time.sleep(0.01 * n)
+                treelog.info(n)
+            return len(recordlog._messages)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+            for n in treelog.iter.pmap("item", work, [1, 2, 3], executor=executor):
+                self.assertEqual(n, 1)
+                treelog.info("got")
+        self.assertEqual(
+            self.recordlog._messages,
+            [
+                ("pushcontext", "item 0/3"),
+                ("recontext", "item 1/3"),
+                ("write", "1", Level.info),
+                ("write", "got", Level.info),
+                ("recontext", "item 2/3"),
+                ("write", "2", Level.info),
+                ("write", "got", Level.info),
+                ("recontext", "item 3/3"),
+                ("write", "3", Level.info),
+                ("write", "got", Level.info),
+                ("popcontext",),
+            ],
+        )
+
+
+class Async(unittest.TestCase):
+    def setUp(self):
+        self.f = io.StringIO()
+        c = treelog.set(treelog.StdoutLog(self.f))
+        c.__enter__()
+        self.addCleanup(c.__exit__, None, None, None)
+
+    @staticmethod
+    async def arange(n):
+        for i in range(n):
+            yield i
+
+    def test_tasks(self):
+        async def task(name):
+            async with treelog.acontext(name):
+                async with treelog.iter.afraction(
+                    "step", self.arange(2), length=2
+                ) as items:
+                    async for i in items:
+                        treelog.info(i)
+                        await asyncio.sleep(0)
+
+        @treelog.withcontext
+        async def main():
+            await asyncio.gather(task("a"), task("b"))
+            treelog.info("done")
+
+        with treelog.context("run"):
+            asyncio.run(main())
+            treelog.info("x")
+        self.assertEqual(
+            self.f.getvalue(),
+            "run > main > a > step 1/2 > 0\n"
+            "run > main > b > step 1/2 > 0\n"
+            "run > main > a > step 2/2 > 1\n"
+            "run > main > b > step 2/2 > 1\n"
+            "run > main > done\n"
+            "run > x\n",
+        )
+        self.assertIs(type(_state.dispatch), _state.Dispatch)
+
+    def test_profile(self):
+        async def a():
+            async with treelog.acontext("a"):
+                await asyncio.sleep(0)
+                with treelog.profile():
+                    treelog.info("ina")
+                await asyncio.sleep(0)
+
+        async def b():
+            async with treelog.acontext("b"):
+                await asyncio.sleep(0)
+                await asyncio.sleep(0)
+                treelog.info("inb")
+
+        async def main():
+            await asyncio.gather(a(), b())
+
+        asyncio.run(main())
+        self.assertEqual(self.f.getvalue(), "a > ina\nb > inb\n")
+        self.assertIs(type(_state.dispatch), _state.Dispatch)
+
+    def test_mixed(self):
+        async def a(started):
+            await started.wait()
+            async with treelog.acontext("a"):
+                treelog.info("in a")
+                await asyncio.sleep(0)
+
+        async def b(started):
+            with treelog.context("b"):
+                started.set()
+                for i in treelog.iter.fraction("step", range(2)):
+                    await asyncio.sleep(0)
+                    treelog.info("in b")
+
+        async def main():
+            started = asyncio.Event()
+            await asyncio.gather(a(started), b(started))
+
+        with treelog.context("run"):
+            asyncio.run(main())
+            treelog.info("x")
+        self.assertEqual(
+            self.f.getvalue(),
+            "run > a > in a\n"
+            "run > b > step 1/2 > in b\n"
+            "run > b > step 2/2 > in b\n"
+            "run > x\n",
+        )
+        self.assertIs(type(_state.dispatch), _state.Dispatch)
+
+    def test_nocontext(self):
+        async def main():
+            async for i in treelog.iter.apercentage("iter", self.arange(2), length=2):
+                treelog.info(i)
+
+        asyncio.run(main())
+        self.assertEqual(self.f.getvalue(), "iter 50% > 0\niter 100% > 1\n")
+
+    def test_sync(self):
+        with self.assertRaises(TypeError):
+            for i in treelog.iter.afraction("iter", self.arange(2), length=2):
+                pass
+
+
 class DocTest(unittest.TestCase):
     def test_docs(self):
-        doctest.testmod(treelog)
+        # the examples log to a stream that follows doctest's replacement of
+        # sys.stdout, which the default logger binds only once
+        log = treelog.FilterLog(treelog.StdoutLog(_Stdout()), minlevel=Level.info)
+        with treelog.set(log):
+            for module in treelog, _record, _timing, treelog.iter:
+                with self.subTest(module.__name__):
+                    self.assertFalse(doctest.testmod(module).failed)
+
+
+class _Stdout:
+    def write(self, text):
+        return sys.stdout.write(text)
 
 
 # vim:sw=4:sts=4:et
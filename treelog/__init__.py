@@ -6,9 +6,11 @@ from importlib import import_module
 
 _sub_mods = {"proto", "iter"}
 _state_attrs = {
+    "acontext",
     "set",
     "add",
     "disable",
+    "profile",
     "context",
     "withcontext",
 }
@@ -22,11 +24,15 @@ _log_objs = {
     "FilterLog",
     "HtmlLog",
     "LoggingLog",
+    "MemoryLog",
     "NullLog",
     "RecordLog",
     "RichOutputLog",
     "StdoutLog",
     "TeeLog",
+    "ThreadLog",
+    "TimingLog",
+    "TraceLog",
 }
 
 
@@ -1,21 +1,60 @@
+import concurrent.futures
+import contextlib
 import functools
+import hashlib
 import os
+import threading
+import types
 import typing
 
-from ._path import makedirs, sequence, non_existent
+from ._path import makedirs, sequence, non_existent, link, unlink, copyfile
 from .proto import Level, Data
 
 
 class DataLog:
-    """Output only data."""
+    """Output only data.
+
+    If ``workers`` is positive, files are written asynchronously by a pool of
+    that many threads. Names are still allocated upon :meth:`write`, in order,
+    but the caller blocks only if the total size of the data that is being
+    written would otherwise exceed ``maxinflight`` bytes. Errors of the
+    background writes are raised by the next :meth:`write`, :meth:`flush` or
+    :meth:`close`, the latter two of which wait for all writes to finish.
+
+    If ``dedup`` is true, data is stored only once per distinct content: the
+    first file with some content is additionally linked into a content
+    addressed store, the hidden ``.store`` subdirectory, and later files with
+    the same content become hard links to it. Where hard links are not
+    supported, files are written as copies. Since linked files share their
+    contents, output files should not be modified in place."""
 
     def __init__(
         self,
         dirpath: str = os.curdir,
         names: typing.Callable[[str], typing.Iterable[str]] = sequence,
+        *,
+        workers: int = 0,
+        maxinflight: int = 2**28,
+        dedup: bool = False,
     ) -> None:
         self._names = functools.lru_cache(maxsize=32)(names)
         self._path = makedirs(dirpath)
+        if dedup:
+            self._store = makedirs(dirpath, ".store")
+            # type: typing.Dict[str, typing.Optional[concurrent.futures.Future[bool]]]
+            self._stored = {}  # digests of stored contents, pending write if async
+        else:
+            self._store = None
+        if workers > 0:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                workers, thread_name_prefix="DataLog"
+            )
+            self._maxinflight = maxinflight
+            self._inflight = 0  # number of bytes being written
+            self._condition = threading.Condition()
+            self._error = None  # type: typing.Optional[BaseException]
+        else:
+            self._executor = None
 
     def pushcontext(self, title: str) -> None:
         pass
@@ -28,8 +67,188 @@ class DataLog:
 
     def write(self, msg, level: Level) -> None:
         if isinstance(msg, Data):
-            _, f = non_existent(
-                self._path, self._names(msg.name), lambda p: p.open("xb")
+            digest = None
+            if self._store is not None:
+                digest = hashlib.sha256(msg.data).hexdigest()
+                if self._isstored(digest):
+                    # a failed link falls back to a synchronous write
+                    self._create(
+                        msg.name,
+                        self._store / digest,
+                        functools.partial(_writeto, msg.data),
+                    )
+                    return
+            if self._executor is None:
+                name, f = non_existent(
+                    self._path, self._names(msg.name), lambda p: p.open("xb")
+                )
+                with f:
+                    f.write(msg.data)
+                if digest is not None and self._storelink(name, digest):
+                    self._stored[digest] = None
+                return
+            # the name is reserved by an empty file that is reopened by the
+            # worker, such that pending writes do not hold file descriptors
+            name, _ = non_existent(
+                self._path, self._names(msg.name), lambda p: p.open("xb").close()
             )
+            size = len(msg.data)
+            with self._condition:
+                self._raise()
+                while self._inflight and self._inflight + size > self._maxinflight:
+                    self._condition.wait()
+                    self._raise()
+                self._inflight += size
+            try:
+                future = self._executor.submit(self._write, msg.data, name, digest)
+                if digest is not None:
+                    self._stored[digest] = future
+            except BaseException:
+                with self._condition:
+                    self._inflight -= size
+                raise
+
+    @contextlib.contextmanager
+    def openfile(
+        self, name: str, level: Level, type: typing.Optional[str] = None
+    ) -> typing.Generator[typing.BinaryIO, None, None]:
+        """Open a file for writing directly in the output directory.
+
+        The file is created under a temporary name and given its final name,
+        allocated as in :meth:`write`, once the with-block is exited without
+        error, such that it never appears partially written. The file is opened
+        for reading as well."""
+
+        _, ext = os.path.splitext(name)
+        tmpname, f = non_existent(
+            self._path, sequence(".partial" + ext), lambda p: p.open("xb+")
+        )
+        tmppath = self._path / tmpname
+        try:
             with f:
-                f.write(msg.data)
+                yield f
+                digest = None
+                if self._store is not None:
+                    f.flush()
+                    f.seek(0)
+                    digest = _digest(f)
+                    if self._isstored(digest):
+                        self._create(
+                            name, self._store / digest, functools.partial(_copyto, f)
+                        )
+                        return
+                _, linked = self._create(name, tmppath, functools.partial(_copyto, f))
+                if linked and digest is not None and self._storelink(tmpname, digest):
+                    self._stored[digest] = None
+        finally:
+            unlink(tmppath)
+
+    def _create(
+        self, name: str, src, fallback: typing.Callable[[typing.Any], None]
+    ) -> typing.Tuple[str, bool]:
+        """Create a new file as a hard link to src, or by calling fallback with
+        its path if hard links are not supported, and return its name and
+        whether it was linked. Either way the file takes the first free name."""
+
+        def create(p) -> bool:
+            try:
+                link(src, p)
+            except FileExistsError:
+                raise
+            except (OSError, NotImplementedError):
+                fallback(p)
+                return False
+            return True
+
+        return non_existent(self._path, self._names(name), create)
+
+    def _isstored(self, digest: str) -> bool:
+        """Return whether content is in the store, waiting for a pending write."""
+
+        if digest not in self._stored:
+            return False
+        future = self._stored[digest]
+        if future is not None and not future.result():
+            # the write or storing failed: later files are written anew
+            del self._stored[digest]
+            return False
+        return True
+
+    def _storelink(self, name: str, digest: str) -> bool:
+        """Add a file to the store, return whether successful."""
+
+        try:
+            link(self._path / name, self._store / digest)
+        except FileExistsError:
+            # the content is stored already, by a previous log
+            pass
+        except (OSError, NotImplementedError):
+            return False
+        return True
+
+    def _write(self, data: bytes, name: str, digest: typing.Optional[str]) -> bool:
+        """Write data to a reserved file, return whether it was stored."""
+
+        try:
+            with (self._path / name).open("wb") as f:
+                f.write(data)
+            if digest is not None:
+                return self._storelink(name, digest)
+        except BaseException as e:
+            with self._condition:
+                if self._error is None:
+                    self._error = e
+        finally:
+            with self._condition:
+                self._inflight -= len(data)
+                self._condition.notify_all()
+        return False
+
+    def _raise(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def flush(self) -> None:
+        """Wait for all asynchronous writes to finish."""
+
+        if self._executor is not None:
+            with self._condition:
+                while self._inflight:
+                    self._condition.wait()
+                self._raise()
+
+    def close(self) -> None:
+        """Wait for all asynchronous writes to finish and stop the workers."""
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self.flush()
+
+    def __enter__(self) -> "DataLog":
+        return self
+
+    def __exit__(
+        self,
+        t: typing.Optional[typing.Type[BaseException]],
+        value: typing.Optional[BaseException],
+        traceback: typing.Optional[types.TracebackType],
+    ) -> None:
+        self.close()
+
+
+def _digest(f: typing.BinaryIO) -> str:
+    h = hashlib.sha256()
+    for chunk in iter(functools.partial(f.read, 2**20), b""):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def _copyto(src: typing.BinaryIO, dst) -> None:
+    with dst.open("xb") as f:
+        copyfile(src, f)
+
+
+def _writeto(data: bytes, dst) -> None:
+    with dst.open("xb") as f:
+        f.write(data)
@@ -0,0 +1,152 @@
+import contextlib
+import io
+import typing
+
+from .proto import Level, Log, Data
+
+
+@contextlib.contextmanager
+def openfile(
+    logs: typing.Sequence[Log],
+    name: str,
+    level: Level,
+    type: typing.Optional[str] = None,
+    *,
+    writes: typing.Optional[typing.Sequence[typing.Callable[..., None]]] = None,
+    openfiles: typing.Optional[
+        typing.Sequence[typing.Optional[typing.Callable[..., typing.Any]]]
+    ] = None,
+) -> typing.Generator[typing.BinaryIO, None, None]:
+    """Open a binary file that is written to several logs.
+
+    Logs that implement :meth:`FileLog.openfile` receive the data as a stream,
+    the first of them while it is being written if possible. If its file is
+    readable and seekable, the other logs are served from it once complete:
+    streaming logs by copying, remaining logs by writing a :class:`Data`
+    object via ``writes``, which defaults to their write methods, and likewise
+    ``openfiles`` to their openfile methods or None if absent. Otherwise,
+    data is streamed to all streaming logs at once, and buffered in a spool for
+    the remaining logs, if any. The spool is kept in memory up to the size that
+    is set by :func:`treelog.set`."""
+
+    if writes is None:
+        writes = [log.write for log in logs]
+    if openfiles is None:
+        openfiles = [getattr(log, "openfile", None) for log in logs]
+    targets = [open for open in openfiles if open is not None]
+    others = [write for open, write in zip(openfiles, writes) if open is None]
+    if not logs:
+        yield _MultiFile([])
+        return
+    with contextlib.ExitStack() as stack:
+        copies = []  # type: typing.List[typing.Callable[..., typing.Any]]
+        if not targets:
+            f = reader = stack.enter_context(_spool())
+        else:
+            f = stack.enter_context(targets[0](name, level, type))
+            if f.readable() and f.seekable():
+                reader = f
+                copies = targets[1:]
+            else:
+                files = [f]
+                for target in targets[1:]:
+                    files.append(stack.enter_context(target(name, level, type)))
+                if others:
+                    reader = stack.enter_context(_spool())
+                    files.append(reader)
+                if len(files) > 1:
+                    f = _MultiFile(files)
+        yield f
+        for target in copies:
+            with target(name, level, type) as g:
+                from ._path import copyfile
+
+                copyfile(reader, g)
+        if others:
+            reader.flush()
+            reader.seek(0)
+            msg = Data(name, reader.read(), type)
+            for write in others:
+                write(msg, level)
+
+
+def _spool() -> "_Spool":
+    from ._state import _spoolsize
+
+    return _Spool(_spoolsize)
+
+
+class _MultiFile(io.BufferedIOBase):
+    """Binary file that writes to several files at once."""
+
+    def __init__(self, files: typing.Sequence[typing.BinaryIO]) -> None:
+        self._files = files
+
+    def write(self, b) -> int:
+        for f in self._files:
+            f.write(b)
+        return memoryview(b).nbytes
+
+    def flush(self) -> None:
+        for f in self._files:
+            if not f.closed:
+                f.flush()
+
+    def writable(self) -> bool:
+        return True
+
+
+class _Spool(io.BufferedIOBase):
+    """Binary file that is kept in memory until it exceeds maxsize bytes."""
+
+    def __init__(self, maxsize: int) -> None:
+        self._file = io.BytesIO()  # type: typing.BinaryIO
+        self._maxsize = maxsize
+        self._rolled = False
+
+    def _rollover(self) -> None:
+        import tempfile
+
+        f = tempfile.TemporaryFile()
+        f.write(self._file.getbuffer())
+        f.seek(self._file.tell())
+        self._file = f
+        self._rolled = True
+
+    def write(self, b) -> int:
+        if (
+            not self._rolled
+            and self._file.tell() + memoryview(b).nbytes > self._maxsize
+        ):
+            self._rollover()
+        return self._file.write(b)
+
+    def read(self, size: typing.Optional[int] = -1) -> bytes:
+        return self._file.read(size)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def fileno(self) -> int:
+        if not self._rolled:
+            raise io.UnsupportedOperation("fileno")
+        return self._file.fileno()
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        super().close()
+        self._file.close()
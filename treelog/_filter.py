@@ -1,5 +1,6 @@
 import typing
 
+from ._file import openfile
 from .proto import Log, Level
 
 
@@ -36,3 +37,13 @@ class FilterLog:
     def write(self, msg, level: Level) -> None:
         if self._passthrough(level):
             self._baselog.write(msg, level)
+
+    def openfile(
+        self, name: str, level: Level, type: typing.Optional[str] = None
+    ) -> typing.ContextManager[typing.BinaryIO]:
+        if not self._passthrough(level):
+            return openfile((), name, level, type)
+        elif hasattr(self._baselog, "openfile"):
+            return self._baselog.openfile(name, level, type)
+        else:
+            return openfile((self._baselog,), name, level, type)
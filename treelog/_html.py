@@ -1,18 +1,27 @@
+import contextlib
+import functools
 import hashlib
 import html
+import io
 import os
+import pathlib
 import sys
 import types
 import typing
 import urllib.parse
 import warnings
 
-from ._path import makedirs, sequence, non_existent
+from ._path import makedirs, sequence, non_existent, private, replace, unlink
 from .proto import Level, Data
 
 
 class HtmlLog:
-    """Output html nested lists."""
+    """Output html nested lists.
+
+    The style sheet and script are written next to the html file, or to
+    ``assetdir`` if given, such that many logs can share a single copy. If
+    ``resume`` is true and the html file exists, for instance after a restart
+    from a checkpoint, messages are appended to it instead of to a new file."""
 
     def __init__(
         self,
@@ -22,13 +31,29 @@ class HtmlLog:
         title: typing.Optional[str] = None,
         htmltitle: typing.Optional[str] = None,
         favicon: typing.Optional[str] = None,
+        assetdir: typing.Optional[str] = None,
+        resume: bool = False,
     ) -> None:
         self._path = makedirs(dirpath)
+        # active contexts that are not yet opened as html elements
+        self._unopened = []  # type: typing.List[str]
+        # number of active contexts that are opened as html elements
+        self._opened = 0
+        if resume and self._resume(filename):
+            return
         self.filename, self._file = non_existent(
-            self._path, sequence(filename), lambda p: p.open("x", encoding="utf-8")
+            self._path,
+            sequence(filename),
+            lambda p: private(p.open("x", encoding="utf-8", newline="\n")),
+        )
+        if assetdir is None:
+            assetpath, prefix = self._path, ""
+        else:
+            assetpath, prefix = makedirs(assetdir), _relurl(assetdir, dirpath)
+        css, js = (
+            prefix + urllib.parse.quote(_write(assetpath, name, data))
+            for name, data in _assets()
         )
-        css = self._write_hash(CSS.encode(), ".css")
-        js = self._write_hash(JS.encode(), ".js")
         if title is None:
             title = " ".join(sys.argv)
         if htmltitle is None:
@@ -40,8 +65,46 @@ class HtmlLog:
                 title=title, htmltitle=htmltitle, css=css, js=js, favicon=favicon
             )
         )
-        # active contexts that are not yet opened as html elements
-        self._unopened = []  # type: typing.List[str]
+
+    def _resume(self, filename: str) -> bool:
+        """Open existing html file for appending, stripping the footer.
+
+        Only the tail of the file is read, unless the footer is missing due to
+        an interrupted run, in which case the file is truncated to its last
+        complete line and the contexts that remain open are closed."""
+
+        path = self._path / filename
+        foot = HTMLFOOT.encode()
+        end = HTMLEND.encode() + b"\n"
+        nopen = 0
+        try:
+            with path.open("rb+") as f:
+                size = f.seek(0, io.SEEK_END)
+                f.seek(max(size - len(foot), 0))
+                if f.read() == foot:
+                    f.truncate(size - len(foot))
+                else:
+                    warnings.warn(
+                        f"{filename} was not closed properly; appending after its"
+                        " last complete line"
+                    )
+                    f.seek(0)
+                    size = 0
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break
+                        size += len(line)
+                        if line.startswith(b'<div class="context">'):
+                            nopen += 1
+                        elif line == end:
+                            nopen -= 1
+                    f.truncate(size)
+        except FileNotFoundError:
+            return False
+        self.filename = filename
+        self._file = private(path.open("a", encoding="utf-8", newline="\n"))
+        self._file.write((HTMLEND + "\n") * nopen)
+        return True
 
     def pushcontext(self, title: str) -> None:
         self._unopened.append(title)
@@ -50,13 +113,50 @@ class HtmlLog:
         if self._unopened:
             self._unopened.pop()
         else:
-            print('</div><div class="end"></div></div>', file=self._file)
+            self._opened -= 1
+            print(HTMLEND, file=self._file)
 
     def recontext(self, title: str) -> None:
         self.popcontext()
         self.pushcontext(title)
 
     def write(self, msg, level: Level) -> None:
+        if isinstance(msg, Data):
+            _, ext = os.path.splitext(msg.name)
+            self._item(self._link(self._write_hash(msg.data, ext), msg.name), level)
+        else:
+            self._item(html.escape(msg), level)
+
+    @contextlib.contextmanager
+    def openfile(
+        self, name: str, level: Level, type: typing.Optional[str] = None
+    ) -> typing.Generator[typing.BinaryIO, None, None]:
+        _, ext = os.path.splitext(name)
+        tmpname, f = non_existent(
+            self._path, sequence(".partial" + ext), lambda p: p.open("xb+")
+        )
+        tmppath = self._path / tmpname
+        try:
+            with f:
+                yield f
+                f.flush()
+                f.seek(0)
+                h = hashlib.sha1()
+                for chunk in iter(functools.partial(f.read, 2**20), b""):
+                    h.update(chunk)
+        except BaseException:
+            unlink(tmppath)
+            raise
+        filename = h.hexdigest() + ext
+        replace(tmppath, self._path / filename)
+        self._item(self._link(filename, name), level)
+
+    def _link(self, filename: str, name: str) -> str:
+        return '<a href="{href}" download="{name}">{name}</a>'.format(
+            href=urllib.parse.quote(filename), name=html.escape(name)
+        )
+
+    def _item(self, text: str, level: Level) -> None:
         for c in self._unopened:
             print(
                 '<div class="context"><div class="title">{}</div><div class="children">'.format(
@@ -64,15 +164,8 @@ class HtmlLog:
                 ),
                 file=self._file,
             )
+        self._opened += len(self._unopened)
         self._unopened.clear()
-        if isinstance(msg, Data):
-            _, ext = os.path.splitext(msg.name)
-            filename = self._write_hash(msg.data, ext)
-            text = '<a href="{href}" download="{name}">{name}</a>'.format(
-                href=urllib.parse.quote(filename), name=html.escape(msg.name)
-            )
-        else:
-            text = html.escape(msg)
         print(
             '<div class="item" data-loglevel="{}">{}</div>'.format(level.value, text),
             file=self._file,
@@ -81,7 +174,8 @@ class HtmlLog:
 
     def close(self) -> bool:
         if hasattr(self, "_file") and not self._file.closed:
-            self._file.write(HTMLFOOT)
+            # contexts are closed such that a resumed log continues at the root
+            self._file.write((HTMLEND + "\n") * self._opened + HTMLFOOT)
             self._file.close()
             return True
         else:
@@ -103,13 +197,40 @@ class HtmlLog:
             warnings.warn("unclosed object {!r}".format(self), ResourceWarning)
 
     def _write_hash(self, data, ext):
-        filename = hashlib.sha1(data).hexdigest() + ext
-        try:
-            with (self._path / filename).open("xb") as f:
-                f.write(data)
-        except FileExistsError:
-            pass
-        return filename
+        return _write(self._path, hashlib.sha1(data).hexdigest() + ext, data)
+
+
+def _write(path, filename: str, data: bytes) -> str:
+    """Write data to filename in path, unless it exists."""
+
+    try:
+        with (path / filename).open("xb") as f:
+            f.write(data)
+    except FileExistsError:
+        pass
+    return filename
+
+
+@functools.lru_cache(maxsize=None)
+def _assets() -> typing.Tuple[typing.Tuple[str, bytes], ...]:
+    """Return the content addressed file names and contents of CSS and JS."""
+
+    return tuple(
+        (hashlib.sha1(data).hexdigest() + ext, data)
+        for data, ext in ((CSS.encode(), ".css"), (JS.encode(), ".js"))
+    )
+
+
+def _relurl(path: str, start: str) -> str:
+    """Return url prefix of directory path relative to directory start."""
+
+    try:
+        rel = os.path.relpath(path, start)
+    except ValueError:  # on different drives
+        return pathlib.Path(os.path.abspath(path)).as_uri() + "/"
+    if rel == os.curdir:
+        return ""
+    return urllib.parse.quote(pathlib.PurePath(rel).as_posix()) + "/"
 
 
 HTMLHEAD = """\
@@ -128,6 +249,8 @@ HTMLHEAD = """\
 <div id="log">
 """
 
+HTMLEND = '</div><div class="end"></div></div>'
+
 HTMLFOOT = """\
 </div></body></html>
 """
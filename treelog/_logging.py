@@ -5,7 +5,14 @@ from .proto import Level
 
 
 class LoggingLog:
-    """Log to Python's built-in logging facility."""
+    """Log to Python's built-in logging facility.
+
+    Messages are only formatted if the logger is enabled for their level. The
+    context path is attached to every record as the ``context`` attribute, a
+    tuple of titles, while the record's message prefixes it to the original
+    message for plain formatters. Records are self-contained, such that they
+    can be handed off to another thread via
+    :class:`logging.handlers.QueueHandler`."""
 
     # type: typing.ClassVar[typing.Tuple[int, int, int, int, int]]
     _levels = logging.DEBUG, logging.INFO, 25, logging.WARNING, logging.ERROR
@@ -24,6 +31,23 @@ class LoggingLog:
         self.currentcontext[-1] = title
 
     def write(self, msg, level: Level, data: typing.Optional[bytes] = None) -> None:
-        self._logger.log(
-            self._levels[level.value], " > ".join((*self.currentcontext, str(msg)))
-        )
+        levelno = self._levels[level.value]
+        # isEnabledFor caches its result until the logging configuration changes
+        if self._logger.isEnabledFor(levelno):
+            context = tuple(self.currentcontext)
+            self._logger.log(
+                levelno, _Message(context, msg), extra={"context": context}
+            )
+
+
+class _Message:
+    """Message of a log record, formatted when converted to string."""
+
+    __slots__ = "context", "msg"
+
+    def __init__(self, context: typing.Tuple[str, ...], msg: typing.Any) -> None:
+        self.context = context
+        self.msg = msg
+
+    def __str__(self) -> str:
+        return " > ".join((*self.context, str(self.msg)))
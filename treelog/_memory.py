@@ -0,0 +1,109 @@
+import mmap
+import os
+import tracemalloc
+import typing
+import weakref
+
+from .proto import Level
+
+
+class MemoryLog:
+    """Measure memory allocated in contexts.
+
+    For every context the net allocation, i.e. the memory in use when the
+    context is closed minus that when it was opened, and the peak allocation
+    relative to the opening are recorded, aggregated over contexts with the
+    same title and parent contexts. The ``method`` determines how memory is
+    measured:
+
+    ``'tracemalloc'``
+        Memory allocated by Python as traced by :mod:`tracemalloc`, which is
+        started if it is not tracing already. This is accurate, including the
+        peak in between context changes, but slows down allocations
+        considerably. Note that the peak of tracemalloc is reset on every
+        context change.
+    ``'rss'``
+        The resident set size as reported by ``/proc/self/statm``, available on
+        Linux only. This costs a single system call per context change and
+        message and includes memory that is allocated outside Python, but the
+        peak is only sampled at context changes and messages.
+
+    The contexts with the highest peaks are listed by :meth:`report`."""
+
+    def __init__(self, method: str = "tracemalloc") -> None:
+        if method == "tracemalloc":
+            self._stop = not tracemalloc.is_tracing()
+            if self._stop:
+                tracemalloc.start()
+            self._sample = tracemalloc.get_traced_memory
+        elif method == "rss":
+            self._stop = False
+            fd = os.open("/proc/self/statm", os.O_RDONLY)
+            self._close = weakref.finalize(self, os.close, fd)
+            self._sample = lambda: _rss(fd)
+        else:
+            raise ValueError(f"invalid method {method!r}")
+        self._method = method
+        current, peak = self._sample()
+        # open contexts as title path, memory at opening and peak
+        self._stack = [((), current, peak)]
+        # type: typing.Dict[typing.Tuple[str, ...], typing.List[int]]
+        self._stats = {}  # count, net and peak allocation per title path
+
+    def pushcontext(self, title: str) -> None:
+        current, peak = self._sample()
+        path, start, parentpeak = self._stack[-1]
+        self._stack[-1] = path, start, max(parentpeak, peak)
+        if self._method == "tracemalloc":
+            tracemalloc.reset_peak()
+        self._stack.append((path + (title,), current, current))
+
+    def popcontext(self) -> None:
+        current, peak = self._sample()
+        path, start, ownpeak = self._stack.pop()
+        peak = max(ownpeak, peak)
+        stats = self._stats.get(path)
+        if stats is None:
+            stats = self._stats[path] = [0, 0, 0]
+        stats[0] += 1
+        stats[1] += current - start
+        stats[2] = max(stats[2], peak - start)
+        parentpath, parentstart, parentpeak = self._stack[-1]
+        self._stack[-1] = parentpath, parentstart, max(parentpeak, peak)
+
+    def recontext(self, title: str) -> None:
+        self.popcontext()
+        self.pushcontext(title)
+
+    def write(self, msg, level: Level) -> None:
+        if self._method == "rss":
+            current, peak = self._sample()
+            path, start, toppeak = self._stack[-1]
+            self._stack[-1] = path, start, max(toppeak, peak)
+
+    def report(self, n: int = 10) -> str:
+        """Return the ``n`` contexts with the highest peak allocation as text."""
+
+        lines = [" peak [MiB]   net [MiB]   count"]
+        for path, (count, net, peak) in sorted(
+            self._stats.items(), key=lambda item: -item[1][2]
+        )[:n]:
+            lines.append(
+                f"{peak / 2**20:11.3f} {net / 2**20:11.3f} {count:7d}  "
+                + " > ".join(path)
+            )
+        return "\n".join(lines) + "\n"
+
+    def close(self) -> None:
+        """Stop measuring, stopping tracemalloc if it was started by the log."""
+
+        if self._stop:
+            tracemalloc.stop()
+            self._stop = False
+        if self._method == "rss":
+            self._close()
+
+
+def _rss(fd: int) -> typing.Tuple[int, int]:
+    rss = int(os.pread(fd, 64, 0).split()[1]) * mmap.PAGESIZE
+    return rss, rss
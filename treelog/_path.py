@@ -1,8 +1,9 @@
 import functools
 import os
 import pathlib
+import shutil
 import typing
-
+import weakref
 
 supports_fd = os.open in os.supports_dir_fd
 
@@ -44,8 +45,104 @@ def non_existent(path, names, f):
     raise Exception("names exhausted")
 
 
+def link(src, dst) -> None:
+    """Create a hard link dst to src, both paths in directories from makedirs."""
+
+    if isinstance(src, _FDFilePath):
+        if os.link not in os.supports_dir_fd:
+            raise NotImplementedError("link does not support dir_fd")
+        os.link(
+            src._filename,
+            dst._filename,
+            src_dir_fd=src._directory._fd,
+            dst_dir_fd=dst._directory._fd,
+        )
+    else:
+        os.link(src, dst)
+
+
+def replace(src, dst) -> None:
+    """Rename src to dst, overwriting dst if it exists."""
+
+    if isinstance(src, _FDFilePath):
+        os.replace(
+            src._filename,
+            dst._filename,
+            src_dir_fd=src._directory._fd,
+            dst_dir_fd=dst._directory._fd,
+        )
+    else:
+        os.replace(src, dst)
+
+
+def unlink(path) -> None:
+    if isinstance(path, _FDFilePath):
+        os.unlink(path._filename, dir_fd=path._directory._fd)
+    else:
+        os.unlink(path)
+
+
+def copyfile(src: typing.BinaryIO, dst: typing.BinaryIO) -> None:
+    """Copy the contents of file src, from the start, to the position of dst."""
+
+    src.flush()
+    dst.flush()
+    offset = 0
+    try:
+        srcfd, dstfd = src.fileno(), dst.fileno()
+        size = os.fstat(srcfd).st_size
+        while offset < size:
+            n = os.copy_file_range(srcfd, dstfd, size - offset, offset)
+            if not n:
+                break
+            offset += n
+    except (AttributeError, OSError, ValueError):
+        # no file descriptors, or copy_file_range is not supported
+        if offset:
+            raise
+    src.seek(offset)
+    shutil.copyfileobj(src, dst)
+
+
+_private = weakref.WeakSet()  # type: weakref.WeakSet[typing.IO]
+
+
+def private(f: typing.IO) -> typing.IO:
+    """Mark file as written to by the current process only.
+
+    Buffered output is flushed before the process forks, and in the child the
+    file descriptor is redirected to the null device, such that the file is
+    neither corrupted by writes of the child nor by a final flush or footer
+    written upon closing it."""
+
+    _private.add(f)
+    return f
+
+
+def _flushprivate() -> None:
+    for f in _private:
+        if not f.closed:
+            f.flush()
+
+
+def _detachprivate() -> None:
+    fd = os.open(os.devnull, os.O_WRONLY)
+    try:
+        for f in _private:
+            if not f.closed:
+                os.dup2(fd, f.fileno(), inheritable=False)
+    finally:
+        os.close(fd)
+    _private.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_flushprivate, after_in_child=_detachprivate)
+
+
 class _FDDirPath:
     def __init__(self, dir_fd: int) -> None:
+        self._fd = dir_fd
         self._opener = functools.partial(os.open, dir_fd=dir_fd)
         self._close = functools.partial(os.close, dir_fd)
         # by holding on to os.close we make sure it is still available during destruction
@@ -63,8 +160,16 @@ class _FDFilePath:
         self._filename = filename
 
     def open(
-        self, mode: str, *, encoding: typing.Optional[str] = None
+        self,
+        mode: str,
+        *,
+        encoding: typing.Optional[str] = None,
+        newline: typing.Optional[str] = None,
     ) -> typing.IO[typing.Any]:
         return open(
-            self._filename, mode, encoding=encoding, opener=self._directory._opener
+            self._filename,
+            mode,
+            encoding=encoding,
+            newline=newline,
+            opener=self._directory._opener,
         )
@@ -0,0 +1,89 @@
+import contextlib
+import time
+import typing
+
+from .proto import Log
+
+
+class Profile:
+    """Call counts and time spent per log and method.
+
+    Instances are created by :func:`treelog.profile`, which routes all calls to
+    the underlying logs through the timed wrappers returned by :meth:`wrap`.
+    The statistics gathered so far are available via :meth:`summary`."""
+
+    def __init__(self) -> None:
+        # type: typing.Dict[typing.Tuple[Log, str], typing.List[typing.Any]]
+        self._stats = {}  # call count and total time per log and method
+
+    def wrap(self, log: Log, method: str) -> typing.Callable[..., None]:
+        """Return the bound method of log, timed."""
+
+        f = getattr(log, method)
+        stats = self._stats.setdefault((log, method), [0, 0.0])
+        perf_counter = time.perf_counter
+
+        def timed(*args: typing.Any) -> None:
+            t0 = perf_counter()
+            try:
+                f(*args)
+            finally:
+                stats[0] += 1
+                stats[1] += perf_counter() - t0
+
+        return timed
+
+    def wrapfile(
+        self, log: Log, method: str = "openfile"
+    ) -> typing.Callable[..., typing.ContextManager[typing.BinaryIO]]:
+        """Return the bound openfile method of log, timed.
+
+        The time is that of opening the file and of committing it upon exit,
+        excluding the time spent inside the with-block."""
+
+        f = getattr(log, method)
+        stats = self._stats.setdefault((log, method), [0, 0.0])
+        perf_counter = time.perf_counter
+
+        @contextlib.contextmanager
+        def timed(*args: typing.Any) -> typing.Generator[typing.BinaryIO, None, None]:
+            t0 = perf_counter()
+            try:
+                with f(*args) as file:
+                    stats[1] += perf_counter() - t0
+                    try:
+                        yield file
+                    finally:
+                        t0 = perf_counter()
+            finally:
+                stats[0] += 1
+                stats[1] += perf_counter() - t0
+
+        return timed
+
+    def summary(self) -> str:
+        """Return the statistics as a text table, ordered by total time.
+
+        Logs are identified by their class name, numbered in order of
+        appearance if the same class occurs more than once."""
+
+        names = {}  # type: typing.Dict[Log, typing.Tuple[str, int]]
+        counts = {}  # type: typing.Dict[str, int]
+        for log, method in self._stats:
+            if log not in names:
+                name = type(log).__name__
+                counts[name] = counts.get(name, 0) + 1
+                names[log] = name, counts[name]
+        lines = [" time [s]     count   mean [us]  method"]
+        for (log, method), (count, seconds) in sorted(
+            self._stats.items(), key=lambda item: -item[1][1]
+        ):
+            if not count:
+                continue
+            name, i = names[log]
+            if counts[name] > 1:
+                name += f"#{i}"
+            lines.append(
+                f"{seconds:9.3f} {count:9d} {seconds / count * 1e6:11.3f}  {name}.{method}"
+            )
+        return "\n".join(lines) + "\n"
@@ -1,6 +1,10 @@
+import concurrent.futures
+import contextlib
+import io
+import itertools
 import typing
 
-from .proto import Level, Log
+from .proto import Level, Log, Data
 
 
 class RecordLog:
@@ -62,6 +66,14 @@ class RecordLog:
     def write(self, msg, level: Level) -> None:
         self._messages.append(("write", msg, level))
 
+    @contextlib.contextmanager
+    def openfile(
+        self, name: str, level: Level, type: typing.Optional[str] = None
+    ) -> typing.Generator[typing.BinaryIO, None, None]:
+        with io.BytesIO() as f:
+            yield f
+            self.write(Data(name, f.getvalue(), type), level)
+
     def replay(self, log: typing.Optional[Log] = None) -> None:
         """Replay this recorded log.
 
@@ -69,7 +81,7 @@ class RecordLog:
         directly specified or currently active."""
 
         if log is None:
-            from ._state import current as log
+            from ._state import dispatch as log
         for cmd, *args in self._messages:
             if cmd == "pushcontext":
                 (title,) = args
@@ -82,3 +94,56 @@ class RecordLog:
             elif cmd == "write":
                 msg, level = args
                 log.write(msg, level)
+
+    @staticmethod
+    def merge(
+        records: typing.Iterable[
+            typing.Union["RecordLog", "concurrent.futures.Future[RecordLog]"]
+        ],
+        titles: typing.Union[str, typing.Iterable[str]] = "record",
+        log: typing.Optional[Log] = None,
+    ) -> None:
+        """Replay several recorded logs, each in its own context.
+
+        The records are replayed in order of iteration, each in a context taken
+        from ``titles``: either an iterable of titles of the same length, or a
+        string that is enumerated as ``record 1``, ``record 2``, etc. A
+        :class:`ValueError` is raised if the lengths differ, once the shorter
+        one is exhausted. Records can be given as
+        :class:`concurrent.futures.Future` objects that resolve to a
+        :class:`RecordLog`, as obtained from an executor, in which case every
+        record is replayed as soon as it and all its predecessors are done:
+
+        >>> import treelog, concurrent.futures
+        >>> def work(n):
+        ...   record = treelog.RecordLog()
+        ...   record.write(f'{n} squared is {n**2}', treelog.proto.Level.info)
+        ...   return record
+        >>> with concurrent.futures.ThreadPoolExecutor() as executor:
+        ...   futures = [executor.submit(work, n) for n in range(2)]
+        ...   treelog.RecordLog.merge(futures, 'worker')
+        worker 1 > 0 squared is 0
+        worker 2 > 1 squared is 1
+        """
+
+        if log is None:
+            from ._state import dispatch as log
+        if isinstance(titles, str):
+            titles = map((titles + " {}").format, itertools.count(1))
+            bounded = False
+        else:
+            titles = iter(titles)
+            bounded = True
+        for record in records:
+            title = next(titles, None)
+            if title is None:
+                raise ValueError("merge() has fewer titles than records")
+            if isinstance(record, concurrent.futures.Future):
+                record = record.result()
+            log.pushcontext(title)
+            try:
+                record.replay(log)
+            finally:
+                log.popcontext()
+        if bounded and next(titles, None) is not None:
+            raise ValueError("merge() has more titles than records")
@@ -1,11 +1,18 @@
 import sys
+import threading
+import time
 import typing
 
 from .proto import Level, Data
 
 
 class RichOutputLog:
-    """Output rich (colored,unicode) text to stream."""
+    """Output rich (colored,unicode) text to stream.
+
+    Context changes are drawn at most once per ``redrawinterval`` seconds;
+    changes that arrive in between are drawn by the next message, or by a
+    timer once the interval has passed, whichever comes first. Leaving the
+    outermost context is always drawn immediately."""
 
     _cmap = (
         "\033[1;30m",  # debug: bold gray
@@ -15,25 +22,54 @@ class RichOutputLog:
         "\033[1;31m",
     )  # error: bold red
 
-    def __init__(self, file=sys.stdout) -> None:
+    def __init__(self, file=sys.stdout, *, redrawinterval: float = 0.05) -> None:
         self._current = ""  # currently printed context
         self.file = file
         set_ansi_console()
         self.currentcontext = []  # type: typing.List[str]
+        self._redrawinterval = redrawinterval
+        self._redrawn = -float("inf")  # time of the last redraw
+        # pending redraw of a context change, if any
+        self._timer = None  # type: typing.Optional[threading.Timer]
+        self._lock = threading.Lock()
 
     def pushcontext(self, title: str) -> None:
-        self.currentcontext.append(title)
-        self.contextchangedhook()
+        with self._lock:
+            self.currentcontext.append(title)
+            self._contextchanged()
 
     def popcontext(self) -> None:
-        self.currentcontext.pop()
-        self.contextchangedhook()
+        with self._lock:
+            self.currentcontext.pop()
+            self._contextchanged()
 
     def recontext(self, title: str) -> None:
-        self.currentcontext[-1] = title
-        self.contextchangedhook()
+        with self._lock:
+            self.currentcontext[-1] = title
+            self._contextchanged()
+
+    def _contextchanged(self) -> None:
+        if not self.currentcontext:
+            self.contextchangedhook()
+        elif self._timer is None:
+            delay = self._redrawn + self._redrawinterval - time.monotonic()
+            if delay <= 0:
+                self.contextchangedhook()
+            else:
+                self._timer = threading.Timer(delay, self._deferredredraw)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _deferredredraw(self) -> None:
+        with self._lock:
+            if threading.current_thread() is self._timer:
+                self.contextchangedhook()
 
     def contextchangedhook(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._redrawn = time.monotonic()
         _current = "".join(item + " > " for item in self.currentcontext)
         if _current == self._current:
             return
@@ -52,21 +88,26 @@ class RichOutputLog:
         self._current = _current
 
     def write(self, msg, level: Level) -> None:
-        if isinstance(msg, Data):
-            info = f" [{msg.info}]"
-            msg = msg.name
-        else:
-            info = ""
-        if self._current and "\n" in msg:
-            msg = msg.replace(
-                "\n",
-                "\033[0m\n" + " > ".rjust(len(self._current)) + self._cmap[level.value],
-            )
-        self.file.write(
-            "".join(
-                [self._cmap[level.value], msg, "\033[0m", info, "\n", self._current]
+        with self._lock:
+            if self._timer is not None:
+                self.contextchangedhook()
+            if isinstance(msg, Data):
+                info = f" [{msg.info}]"
+                msg = msg.name
+            else:
+                info = ""
+            if self._current and "\n" in msg:
+                msg = msg.replace(
+                    "\n",
+                    "\033[0m\n"
+                    + " > ".rjust(len(self._current))
+                    + self._cmap[level.value],
+                )
+            self.file.write(
+                "".join(
+                    [self._cmap[level.value], msg, "\033[0m", info, "\n", self._current]
+                )
             )
-        )
 
 
 def first(items: typing.Iterable[bool]) -> int:
@@ -1,36 +1,356 @@
+import atexit
 import contextlib
+import contextvars
 import functools
 import io
-import tempfile
+import os
+import sys
+import threading
 import typing
 
-from ._data import DataLog
-from ._stdout import StdoutLog
 from ._tee import TeeLog
 from ._filter import FilterLog
 from ._null import NullLog
+from ._file import openfile
+from ._profile import Profile
 from .proto import Level, Log, Data
 
-current = FilterLog(TeeLog(StdoutLog(), DataLog()), minlevel=Level.info)
 
+class Dispatch:
+    """Flattened form of a composition of logs.
+
+    Any nesting of :class:`FilterLog`, :class:`TeeLog` and :class:`NullLog` is
+    resolved upon construction into a list of underlying logs, and for every
+    level the bound write methods of only those logs that accept it. Dispatching
+    a message is thereby reduced to a single table lookup. If a profile is
+    given, the methods of the underlying logs are timed by it."""
+
+    def __init__(self, log: Log, profile: typing.Optional[Profile] = None) -> None:
+        logs = list(_flatten(log, tuple(Level)))
+        method = getattr if profile is None else profile.wrap
+        self._pushcontext = tuple(method(log, "pushcontext") for log, levels in logs)
+        self._popcontext = tuple(method(log, "popcontext") for log, levels in logs)
+        self._recontext = tuple(method(log, "recontext") for log, levels in logs)
+        writes = [(method(log, "write"), levels) for log, levels in logs]
+        # type: typing.Tuple[typing.Tuple[typing.Callable[[typing.Any, Level], None], ...], ...]
+        self.writers = tuple(
+            tuple(write for write, levels in writes if level in levels)
+            for level in Level
+        )
+        # underlying logs per level, corresponding to writers
+        self.logs = tuple(
+            tuple(log for log, levels in logs if level in levels) for level in Level
+        )
+        # openfile methods per level, corresponding to logs, None if absent
+        self.openfiles = tuple(
+            tuple(
+                (
+                    (getattr if profile is None else profile.wrapfile)(log, "openfile")
+                    if hasattr(log, "openfile")
+                    else None
+                )
+                for log in levellogs
+            )
+            for levellogs in self.logs
+        )
+
+    def pushcontext(self, title: str) -> None:
+        for pushcontext in self._pushcontext:
+            pushcontext(title)
+
+    def popcontext(self) -> None:
+        for popcontext in self._popcontext:
+            popcontext()
+
+    def recontext(self, title: str) -> None:
+        for recontext in self._recontext:
+            recontext(title)
+
+    def write(self, msg, level: Level) -> None:
+        for write in self.writers[level.value]:
+            write(msg, level)
+
+
+def _flatten(
+    log: Log, levels: typing.Tuple[Level, ...]
+) -> typing.Iterator[typing.Tuple[Log, typing.Tuple[Level, ...]]]:
+    """Yield the underlying logs of a composition with the levels they accept."""
+
+    if type(log) is FilterLog:
+        yield from _flatten(
+            log._baselog, tuple(level for level in levels if log._passthrough(level))
+        )
+    elif type(log) is TeeLog:
+        for baselog in log._baselogs:
+            yield from _flatten(baselog, levels)
+    elif type(log) is _DefaultLog:
+        yield from _flatten(log._get(), levels)
+    elif type(log) is not NullLog:
+        yield log, levels
+
+
+class _TaskDispatch:
+    """Task aware form of a dispatch plan.
+
+    Contexts are not passed on directly but tracked per task, or per thread, in
+    a context variable. Prior to writing a message the underlying logs are
+    brought from the context path of the task that wrote last to that of the
+    writing task, by closing contexts down to the common parent and opening
+    the remainder. The underlying logs thereby see a single consistent tree,
+    in which contexts appear only once something is written to them."""
+
+    def __init__(self, base: Dispatch) -> None:
+        self._base = base
+        self._synced = ()  # type: typing.Tuple[str, ...]
+        self.writers = tuple((self.write,) if w else () for w in base.writers)
+
+    def pushcontext(self, title: str) -> None:
+        _taskpath.set(_taskpath.get() + (title,))
+
+    def popcontext(self) -> None:
+        _taskpath.set(_taskpath.get()[:-1])
+
+    def recontext(self, title: str) -> None:
+        _taskpath.set(_taskpath.get()[:-1] + (title,))
+
+    def write(self, msg, level: Level) -> None:
+        self.sync(_taskpath.get())
+        self._base.write(msg, level)
+
+    def sync(self, path: typing.Tuple[str, ...]) -> None:
+        synced = self._synced
+        if path == synced:
+            return
+        n = 0
+        for a, b in zip(path, synced):
+            if a != b:
+                break
+            n += 1
+        if n == len(path) - 1 == len(synced) - 1:
+            self._base.recontext(path[-1])
+        else:
+            for i in range(len(synced) - n):
+                self._base.popcontext()
+            for title in path[n:]:
+                self._base.pushcontext(title)
+        self._synced = path
+
+
+_taskpath = contextvars.ContextVar("treelog.taskpath", default=())
+_ntasks = 0  # number of active task contexts
+
+
+class _LocalDispatch:
+    """Dispatch plan that can be overridden per thread or task.
+
+    Calls are passed on to the dispatch plan set in a context variable by
+    :func:`_capture`, or by :func:`set` inside it, or to the base plan if none
+    is set."""
+
+    def __init__(self, base: typing.Union[Dispatch, _TaskDispatch]) -> None:
+        self._base = base
+        self.writers = tuple((self.write,) for level in Level)
+
+    def _get(self) -> typing.Union[Dispatch, _TaskDispatch]:
+        local = _local.get()
+        return self._base if local is None else local[1]
+
+    def pushcontext(self, title: str) -> None:
+        self._get().pushcontext(title)
 
-@contextlib.contextmanager
-def set(logger: Log) -> typing.Generator[Log, None, None]:
-    """Set logger as current."""
+    def popcontext(self) -> None:
+        self._get().popcontext()
+
+    def recontext(self, title: str) -> None:
+        self._get().recontext(title)
+
+    def write(self, msg, level: Level) -> None:
+        self._get().write(msg, level)
+
+
+_local = contextvars.ContextVar(
+    "treelog.local", default=None
+)  # type: contextvars.ContextVar[typing.Optional[typing.Tuple[Log, Dispatch]]]
+_nlocal = 0  # number of active local overrides
+_locallock = threading.Lock()
+
+
+class _DefaultLog:
+    """Default logger, constructed on first use.
+
+    Writes messages of level info and up to stdout and data to the current
+    directory. Construction is deferred such that importing treelog does not
+    create directories or open file descriptors that may never be used."""
+
+    def __init__(self) -> None:
+        self._log = None  # type: typing.Optional[Log]
+        self._lock = threading.Lock()
+
+    def _get(self) -> Log:
+        if self._log is None:
+            with self._lock:
+                if self._log is None:
+                    from ._data import DataLog
+                    from ._stdout import StdoutLog
+
+                    self._log = FilterLog(
+                        TeeLog(StdoutLog(), DataLog()), minlevel=Level.info
+                    )
+        return self._log
+
+    def pushcontext(self, title: str) -> None:
+        self._get().pushcontext(title)
+
+    def popcontext(self) -> None:
+        self._get().popcontext()
+
+    def recontext(self, title: str) -> None:
+        self._get().recontext(title)
+
+    def write(self, msg, level: Level) -> None:
+        self._get().write(msg, level)
+
+    def openfile(
+        self, name: str, level: Level, type: typing.Optional[str] = None
+    ) -> typing.ContextManager[typing.BinaryIO]:
+        return openfile((self._get(),), name, level, type)
+
+
+class _LazyDispatch(Dispatch):
+    """Dispatch plan that is compiled upon first use."""
+
+    # attributes set by Dispatch.__init__
+    _compiled = (
+        "_pushcontext",
+        "_popcontext",
+        "_recontext",
+        "writers",
+        "logs",
+        "openfiles",
+    )
+
+    def __init__(self, log: Log, profile: typing.Optional[Profile] = None) -> None:
+        self._args = log, profile
+
+    def __getattr__(self, attr: str) -> typing.Any:
+        # only called for attributes that are not set, such that any other
+        # attribute is missing as usual without compiling the plan
+        if attr not in self._compiled or "writers" in vars(self):
+            raise AttributeError(attr)
+        Dispatch.__init__(self, *self._args)
+        return object.__getattribute__(self, attr)
+
+
+current = _DefaultLog()  # type: Log
+profiling = None  # type: typing.Optional[Profile]
+if os.environ.get("TREELOG_PROFILE"):
+    profiling = Profile()
+    atexit.register(lambda profile=profiling: sys.stderr.write(profile.summary()))
+dispatch = _LazyDispatch(current, profiling)  # type: Dispatch
+_spoolsize = 2**20  # maximum size of in-memory file buffers
+
+
+def _wrap(plan: typing.Any) -> typing.Any:
+    """Return plan in the task and local aware forms that are active.
+
+    Existing wrappers are reused or removed as needed, such that the contexts
+    tracked by a task aware plan are retained while tasks are active."""
+
+    if isinstance(plan, _LocalDispatch):
+        plan = plan._base
+    if isinstance(plan, _TaskDispatch):
+        if not _ntasks:
+            plan.sync(())
+            plan = plan._base
+    elif _ntasks:
+        plan = _TaskDispatch(plan)
+    return _LocalDispatch(plan) if _nlocal else plan
 
-    global current
-    old = current
+
+def _close(plan: typing.Any) -> None:
+    """Close the contexts that a task aware plan opened in its logs.
+
+    This is required before the plan is replaced, as the contexts are opened
+    anew by its successor."""
+
+    if isinstance(plan, _LocalDispatch):
+        plan = plan._base
+    if isinstance(plan, _TaskDispatch):
+        plan.sync(())
+
+
+def _plan(logger: Log) -> typing.Any:
+    """Return the dispatch plan of a logger that is to be made current."""
+
+    return _wrap(Dispatch(logger, profiling))
+
+
+def _current() -> Log:
+    """Return the current logger of the current thread or task."""
+
+    local = _local.get()
+    return current if local is None else local[0]
+
+
+def _afterfork() -> None:
+    """Reset the logger in a child process after fork.
+
+    The logs of the parent remain the parent's to write, so the child starts
+    out with a default logger of its own, as after a fresh import. Loggers set
+    in the child, such as the records of :func:`treelog.iter.pmap`, work as
+    usual."""
+
+    global current, dispatch, _locallock
+    _locallock = threading.Lock()
+    current = _DefaultLog()
+    dispatch = _wrap(_LazyDispatch(current, profiling))
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_afterfork)
+
+
+@contextlib.contextmanager
+def set(
+    logger: Log, *, spoolsize: typing.Optional[int] = None
+) -> typing.Generator[Log, None, None]:
+    """Set logger as current.
+
+    Files opened by :func:`treelog.userfile` and friends are buffered in
+    memory up to ``spoolsize`` bytes before moving to a temporary file, unless
+    written directly to their destination by the logger; the current size is
+    retained if not specified. Inside a function mapped by
+    :func:`treelog.iter.pmap` the logger is set for the calling thread or task
+    only."""
+
+    global current, dispatch, _spoolsize
+    old = current, dispatch, _spoolsize
+    token = None
     try:
-        current = logger
+        if _local.get() is None:
+            _close(dispatch)
+            current = logger
+            dispatch = _plan(logger)
+        else:
+            token = _local.set((logger, Dispatch(logger, profiling)))
+        if spoolsize is not None:
+            _spoolsize = spoolsize
         yield logger
     finally:
-        current = old
+        if token is None:
+            _close(dispatch)
+            current, dispatch = old[0], _wrap(old[1])
+        else:
+            _local.reset(token)
+        _spoolsize = old[2]
 
 
-def add(logger: Log) -> typing.ContextManager[Log]:
+def add(
+    logger: Log, *, spoolsize: typing.Optional[int] = None
+) -> typing.ContextManager[Log]:
     """Add logger to current."""
 
-    return set(TeeLog(current, logger))
+    return set(TeeLog(_current(), logger), spoolsize=spoolsize)
 
 
 def disable() -> typing.ContextManager[Log]:
@@ -39,6 +359,29 @@ def disable() -> typing.ContextManager[Log]:
     return set(NullLog())
 
 
+@contextlib.contextmanager
+def profile() -> typing.Generator[Profile, None, None]:
+    """Measure time spent in logs.
+
+    Returns an enterable object which upon enter starts counting calls and
+    measuring time per underlying log and method, for the current logger as
+    well as for loggers that are set inside the with-block. Upon enter a
+    :class:`Profile` is returned, the summary of which lists the totals.
+    Setting the environment variable ``TREELOG_PROFILE`` profiles the entire
+    program, writing the summary to stderr at exit."""
+
+    global profiling, dispatch
+    old = profiling, dispatch
+    try:
+        profiling = Profile()
+        _close(dispatch)
+        dispatch = _plan(current)
+        yield profiling
+    finally:
+        _close(dispatch)
+        profiling, dispatch = old[0], _wrap(old[1])
+
+
 @contextlib.contextmanager
 def context(
     title: str, *initargs: typing.Any, **initkwargs: typing.Any
@@ -48,30 +391,129 @@ def context(
     Returns an enterable object which upon enter creates a context with a given
     title, to be automatically closed upon exit. In case additional arguments are
     given the title is used as a format string, and a callable is returned that
-    allows for recontextualization from within the current with-block."""
+    allows for recontextualization from within the current with-block. Inside
+    an :mod:`asyncio` task the context is opened for that task only, as by
+    :func:`acontext`."""
+
+    task = _intask()
+    if task:
+        _entertask()
+    try:
+        log = dispatch
+        if initargs or initkwargs:
+            format = title.format
+
+            def reformat(*args, **kwargs):
+                log.recontext(format(*args, **kwargs))
+
+            title = title.format(*initargs, **initkwargs)
+        else:
+            reformat = None
+        log.pushcontext(title)
+        try:
+            yield reformat
+        finally:
+            log.popcontext()
+    finally:
+        if task:
+            _exittask()
 
-    log = current
-    if initargs or initkwargs:
-        format = title.format
 
-        def reformat(*args, **kwargs):
-            log.recontext(format(*args, **kwargs))
+def _intask() -> bool:
+    """Return whether the caller runs in an asyncio event loop."""
 
-        title = title.format(*initargs, **initkwargs)
-    else:
-        reformat = None
-    log.pushcontext(title)
+    asyncio = sys.modules.get("asyncio")
+    return asyncio is not None and asyncio._get_running_loop() is not None
+
+
+def _entertask() -> None:
+    """Track contexts per task until the matching :func:`_exittask`."""
+
+    global dispatch, _ntasks
+    with _locallock:
+        _ntasks += 1
+        dispatch = _wrap(dispatch)
+
+
+def _exittask() -> None:
+    global dispatch, _ntasks
+    with _locallock:
+        _ntasks -= 1
+        dispatch = _wrap(dispatch)
+
+
+@contextlib.contextmanager
+def _taskmode() -> typing.Generator[None, None, None]:
+    """Track contexts per task for the duration of the with-block."""
+
+    _entertask()
     try:
-        yield reformat
+        yield
     finally:
-        log.popcontext()
+        _exittask()
+
+
+@contextlib.contextmanager
+def _localmode() -> typing.Generator[None, None, None]:
+    """Allow per thread or task overrides for the duration of the with-block."""
+
+    global dispatch, _nlocal
+    with _locallock:
+        _nlocal += 1
+        dispatch = _wrap(dispatch)
+    try:
+        yield
+    finally:
+        with _locallock:
+            _nlocal -= 1
+            dispatch = _wrap(dispatch)
+
+
+@contextlib.contextmanager
+def _capture(logger: Log) -> typing.Generator[Log, None, None]:
+    """Set logger as current for the current thread or task only."""
+
+    with _localmode():
+        token = _local.set((logger, Dispatch(logger, profiling)))
+        try:
+            yield logger
+        finally:
+            _local.reset(token)
+
+
+@contextlib.asynccontextmanager
+async def acontext(
+    title: str, *initargs: typing.Any, **initkwargs: typing.Any
+) -> typing.AsyncGenerator[typing.Optional[typing.Callable[..., None]], None]:
+    """Asynchronously enterable context.
+
+    Equivalent to :func:`context`, which inside an :mod:`asyncio` task opens
+    the context only for the current task as well. While any such context is
+    open, contexts are tracked per task, such that tasks running concurrently
+    each log in their own branch of the tree."""
+
+    with _taskmode(), context(title, *initargs, **initkwargs) as reformat:
+        yield reformat
 
 
 T = typing.TypeVar("T")
 
 
 def withcontext(f: typing.Callable[..., T]) -> typing.Callable[..., T]:
-    """Decorator; executes the wrapped function in its own logging context."""
+    """Decorator; executes the wrapped function in its own logging context.
+
+    Coroutine functions are executed in a context of :func:`acontext`."""
+
+    import inspect
+
+    if inspect.iscoroutinefunction(f):
+
+        @functools.wraps(f)
+        async def awrapped(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            async with acontext(f.__name__):
+                return await f(*args, **kwargs)
+
+        return awrapped
 
     @functools.wraps(f)
     def wrapped(*args: typing.Any, **kwargs: typing.Any) -> T:
@@ -91,7 +533,11 @@ def write(level: Level, *args: typing.Any, sep: str = " ") -> None:
     sep : :class:`str`
         String inserted between values, default a space.
     """
-    current.write(sep.join(map(str, args)), level)
+    writers = dispatch.writers[level.value]
+    if writers:
+        msg = sep.join(map(str, args))
+        for write in writers:
+            write(msg, level)
 
 
 @contextlib.contextmanager
@@ -111,15 +557,27 @@ def file(level: Level, name: str, mode: str, type: typing.Optional[str] = None):
         binary = False
     else:
         raise ValueError(f"invalid mode {mode!r}")
-    with tempfile.TemporaryFile() as f, context(name):
-        yield f if binary else io.TextIOWrapper(f, write_through=True)
-        f.seek(0)
-        data = f.read()
-    current.write(Data(name, data, type), level)
+    plan = dispatch
+    if isinstance(plan, _LocalDispatch):
+        plan = plan._get()
+    if isinstance(plan, Dispatch):
+        logs = plan.logs[level.value]
+        writes = plan.writers[level.value]
+        openfiles = plan.openfiles[level.value]
+    else:
+        logs, writes, openfiles = (plan,), (plan.write,), None
+    with openfile(logs, name, level, type, writes=writes, openfiles=openfiles) as f:
+        with context(name):
+            if binary:
+                yield f
+            else:
+                wrapper = io.TextIOWrapper(f, write_through=True)
+                yield wrapper
+                wrapper.detach()
 
 
 def data(level: Level, name: str, data: bytes, type: typing.Optional[str] = None):
-    current.write(Data(name, data, type), level)
+    dispatch.write(Data(name, data, type), level)
 
 
 def partial(attr):
@@ -1,26 +1,120 @@
+import os
 import sys
+import threading
+import typing
+import weakref
 
 from . import proto
 
 
 class StdoutLog:
-    """Output plain text to stream."""
+    """Output plain text to stream.
 
-    def __init__(self, file=sys.stdout):
+    By default every message is written to the stream directly, leaving any
+    buffering to the stream itself. If ``bufsize`` is positive, messages are
+    instead collected and written in batches, followed by a flush of the stream,
+    once the collected text reaches ``bufsize`` characters, ``flushinterval``
+    seconds after the first message of a batch by means of a timer, upon a
+    message of level ``flushlevel`` or higher, upon leaving the outermost
+    context, upon :meth:`flush`, and at the latest when the log is garbage
+    collected or the interpreter exits."""
+
+    def __init__(
+        self,
+        file=sys.stdout,
+        *,
+        bufsize: int = 0,
+        flushinterval: typing.Optional[float] = None,
+        flushlevel: proto.Level = proto.Level.warning,
+    ):
         self.file = file
         self.currentcontext = []  # type: typing.List[str]
+        # context prefix and continuation indent, or None if outdated
+        self._prefix = None  # type: typing.Optional[typing.Tuple[str, str]]
+        self._bufsize = bufsize
+        if bufsize > 0:
+            self._buffer = []  # type: typing.Optional[typing.List[str]]
+            self._buffered = 0
+            self._flushinterval = flushinterval
+            self._flushlevel = flushlevel.value
+            # pending flush of the current batch, if any
+            self._timer = None  # type: typing.Optional[threading.Timer]
+            self._lock = threading.Lock()
+            self._finalize = weakref.finalize(
+                self, _finalize, os.getpid(), self._buffer, file
+            )
+        else:
+            self._buffer = None
 
     def pushcontext(self, title: str) -> None:
         self.currentcontext.append(title + " > ")
+        self._prefix = None
 
     def popcontext(self) -> None:
         self.currentcontext.pop()
+        self._prefix = None
+        if self._buffer and not self.currentcontext:
+            self.flush()
 
     def recontext(self, title: str) -> None:
         self.currentcontext[-1] = title + " > "
+        self._prefix = None
 
     def write(self, msg, level: proto.Level) -> None:
+        msg = str(msg)
         if self.currentcontext:
-            prefix = "".join(self.currentcontext)
-            msg = prefix + str(msg).replace("\n", "\n" + " > ".rjust(len(prefix)))
-        print(msg, file=self.file)
+            if self._prefix is None:
+                prefix = "".join(self.currentcontext)
+                self._prefix = prefix, "\n" + " > ".rjust(len(prefix))
+            prefix, indent = self._prefix
+            msg = prefix + msg.replace("\n", indent)
+        msg += "\n"
+        if self._buffer is None:
+            self.file.write(msg)
+            return
+        with self._lock:
+            self._buffer.append(msg)
+            self._buffered += len(msg)
+            if (
+                self._buffered >= self._bufsize
+                or level.value >= self._flushlevel
+                or self._flushinterval is not None
+                and self._flushinterval <= 0
+            ):
+                self._flush()
+            elif self._flushinterval is not None and self._timer is None:
+                self._timer = threading.Timer(self._flushinterval, self._timedflush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """Write out all buffered messages and flush the stream."""
+
+        if self._buffer is not None:
+            with self._lock:
+                self._flush()
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        _flush(self._buffer, self.file)
+        self._buffered = 0
+
+    def _timedflush(self) -> None:
+        with self._lock:
+            if threading.current_thread() is self._timer:
+                self._flush()
+
+
+def _flush(buffer: typing.List[str], file) -> None:
+    if buffer:
+        file.write("".join(buffer))
+        buffer.clear()
+        file.flush()
+
+
+def _finalize(pid: int, buffer: typing.List[str], file) -> None:
+    # a forked child holds a copy of the buffer, which is the parent's to write
+    if os.getpid() == pid:
+        _flush(buffer, file)
@@ -1,25 +1,42 @@
+import typing
+
+from ._file import openfile
 from .proto import Level, Log
 
 
 class TeeLog:
-    """Forward messages to two underlying loggers."""
+    """Forward messages to any number of underlying loggers.
+
+    Underlying loggers that are themselves instances of :class:`TeeLog` are
+    flattened, so that every message is dispatched in a single loop regardless
+    of how the composition was built up."""
 
-    def __init__(self, baselog1: Log, baselog2: Log) -> None:
-        self._baselog1 = baselog1
-        self._baselog2 = baselog2
+    def __init__(self, *baselogs: Log) -> None:
+        self._baselogs = tuple(
+            log
+            for baselog in baselogs
+            for log in (
+                baselog._baselogs if isinstance(baselog, TeeLog) else (baselog,)
+            )
+        )
 
     def pushcontext(self, title: str) -> None:
-        self._baselog1.pushcontext(title)
-        self._baselog2.pushcontext(title)
+        for baselog in self._baselogs:
+            baselog.pushcontext(title)
 
     def popcontext(self) -> None:
-        self._baselog1.popcontext()
-        self._baselog2.popcontext()
+        for baselog in self._baselogs:
+            baselog.popcontext()
 
     def recontext(self, title: str) -> None:
-        self._baselog1.recontext(title)
-        self._baselog2.recontext(title)
+        for baselog in self._baselogs:
+            baselog.recontext(title)
 
     def write(self, msg, level: Level) -> None:
-        self._baselog1.write(msg, level)
-        self._baselog2.write(msg, level)
+        for baselog in self._baselogs:
+            baselog.write(msg, level)
+
+    def openfile(
+        self, name: str, level: Level, type: typing.Optional[str] = None
+    ) -> typing.ContextManager[typing.BinaryIO]:
+        return openfile(self._baselogs, name, level, type)
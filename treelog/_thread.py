@@ -0,0 +1,78 @@
+import threading
+import typing
+
+from ._record import RecordLog
+from .proto import Level, Log
+
+
+class ThreadLog:
+    """Forward messages of multiple threads to an underlying logger.
+
+    Messages of the thread that created the log are forwarded directly. Other
+    threads record their messages until they close their outermost context,
+    upon which the recorded subtree is forwarded at once in a context titled
+    after the thread, nested in whatever context the creating thread is in.
+    Messages written by other threads outside any context are forwarded
+    immediately, in the same manner. A lock guards all access to the
+    underlying logger, so that loggers that are not thread safe themselves,
+    such as :class:`HtmlLog` and :class:`StdoutLog`, see a properly nested
+    stream of messages."""
+
+    def __init__(self, baselog: Log) -> None:
+        self._baselog = baselog
+        self._owner = threading.get_ident()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def pushcontext(self, title: str) -> None:
+        if threading.get_ident() == self._owner:
+            with self._lock:
+                self._baselog.pushcontext(title)
+        else:
+            record = getattr(self._local, "record", None)
+            if record is None:
+                record = self._local.record = RecordLog()
+                self._local.depth = 0
+            self._local.depth += 1
+            record.pushcontext(title)
+
+    def popcontext(self) -> None:
+        if threading.get_ident() == self._owner:
+            with self._lock:
+                self._baselog.popcontext()
+        else:
+            record = self._local.record
+            record.popcontext()
+            self._local.depth -= 1
+            if not self._local.depth:
+                self._local.record = None
+                self._emit(record)
+
+    def recontext(self, title: str) -> None:
+        if threading.get_ident() == self._owner:
+            with self._lock:
+                self._baselog.recontext(title)
+        else:
+            self._local.record.recontext(title)
+
+    def write(self, msg, level: Level) -> None:
+        if threading.get_ident() == self._owner:
+            with self._lock:
+                self._baselog.write(msg, level)
+        else:
+            record = getattr(self._local, "record", None)
+            if record is None:
+                record = RecordLog()
+                record.write(msg, level)
+                self._emit(record)
+            else:
+                record.write(msg, level)
+
+    def _emit(self, record: RecordLog) -> None:
+        title = threading.current_thread().name
+        with self._lock:
+            self._baselog.pushcontext(title)
+            try:
+                record.replay(self._baselog)
+            finally:
+                self._baselog.popcontext()
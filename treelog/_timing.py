@@ -0,0 +1,140 @@
+import json
+import time
+import typing
+
+from .proto import Level
+
+
+class TimingLog:
+    """Measure wall-clock and CPU time spent in contexts.
+
+    Every context is timed from :meth:`pushcontext` until :meth:`popcontext`,
+    with :meth:`recontext` ending the time of the old title and starting that
+    of the new one. Times of contexts with the same title and the same parent
+    contexts are added up. The resulting profile is available as an indented
+    text table via :meth:`report`, and for flame graph tools in the collapsed
+    stack format via :meth:`collapsed` and the speedscope format via
+    :meth:`speedscope`, for instance:
+
+    >>> import treelog
+    >>> timing = treelog.TimingLog()
+    >>> with treelog.add(timing):
+    ...   with treelog.context('compute'):
+    ...     pass
+    >>> print(timing.collapsed(), end='') # doctest: +ELLIPSIS
+    compute ...
+    >>> with treelog.set(treelog.RecordLog()) as record:
+    ...   treelog.userdata('profile.json', timing.speedscope().encode())
+
+    Contexts that are still open do not contribute their time until closed."""
+
+    def __init__(self) -> None:
+        self._root = _Node()
+        # open contexts with wall-clock and CPU time at opening
+        self._stack = [(self._root, time.perf_counter(), time.process_time())]
+
+    def pushcontext(self, title: str) -> None:
+        children = self._stack[-1][0].children
+        node = children.get(title)
+        if node is None:
+            node = children[title] = _Node()
+        self._stack.append((node, time.perf_counter(), time.process_time()))
+
+    def popcontext(self) -> None:
+        node, wall, cpu = self._stack.pop()
+        node.count += 1
+        node.wall += time.perf_counter() - wall
+        node.cpu += time.process_time() - cpu
+
+    def recontext(self, title: str) -> None:
+        self.popcontext()
+        self.pushcontext(title)
+
+    def write(self, msg, level: Level) -> None:
+        pass
+
+    def report(self) -> str:
+        """Return the profile as a text table, ordered by wall-clock time."""
+
+        lines = [" wall [s]   cpu [s]   count"]
+        for path, node in self._walk(self._root, (), sort=True):
+            lines.append(
+                f"{node.wall:9.3f} {node.cpu:9.3f} {node.count:7d}  "
+                + "  " * (len(path) - 1)
+                + path[-1]
+            )
+        return "\n".join(lines) + "\n"
+
+    def collapsed(self) -> str:
+        """Return the profile in collapsed stack format.
+
+        Every line consists of the semicolon separated context titles followed
+        by the wall-clock time spent exclusively in the last context, in integer
+        microseconds."""
+
+        return "".join(
+            ";".join(title.replace(";", ",") for title in path)
+            + f" {round(node.selftime('wall') * 1e6)}\n"
+            for path, node in self._walk(self._root, ())
+        )
+
+    def speedscope(self) -> str:
+        """Return the profile in speedscope's JSON file format.
+
+        The file contains a wall-clock and a CPU time profile, with every
+        context represented as a sample weighted by its exclusive time."""
+
+        frames = {}  # type: typing.Dict[str, int]
+        samples = []
+        nodes = []
+        for path, node in self._walk(self._root, ()):
+            samples.append([frames.setdefault(title, len(frames)) for title in path])
+            nodes.append(node)
+        profiles = []
+        for unit in "wall", "cpu":
+            weights = [node.selftime(unit) for node in nodes]
+            profiles.append(
+                {
+                    "type": "sampled",
+                    "name": f"{unit} time",
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            )
+        return json.dumps(
+            {
+                "$schema": "https://www.speedscope.app/file-format-schema.json",
+                "shared": {"frames": [{"name": title} for title in frames]},
+                "profiles": profiles,
+                "exporter": "treelog",
+            }
+        )
+
+    def _walk(
+        self, node: "_Node", path: typing.Tuple[str, ...], sort: bool = False
+    ) -> typing.Iterator[typing.Tuple[typing.Tuple[str, ...], "_Node"]]:
+        items = node.children.items()
+        if sort:
+            items = sorted(items, key=lambda item: -item[1].wall)
+        for title, child in items:
+            yield path + (title,), child
+            yield from self._walk(child, path + (title,), sort)
+
+
+class _Node:
+    __slots__ = "count", "wall", "cpu", "children"
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.children = {}  # type: typing.Dict[str, _Node]
+
+    def selftime(self, unit: str) -> float:
+        total = getattr(self, unit)
+        for child in self.children.values():
+            total -= getattr(child, unit)
+        return max(total, 0.0)
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import time
+import types
+import typing
+import warnings
+
+from ._path import makedirs, sequence, non_existent, private
+from .proto import Level, Data
+
+
+class TraceLog:
+    """Output a timeline of contexts in Chrome's trace event format.
+
+    Contexts are written as duration events on a track per process and thread,
+    messages as instant events, and data items as instant events annotated with
+    their name, type and size. Events are streamed to disk as they occur; the
+    resulting file can be loaded in Perfetto or chrome://tracing. Since the
+    format does not require the closing bracket that is written by
+    :meth:`close`, the file of an interrupted run can be loaded as well."""
+
+    def __init__(self, dirpath: str, *, filename: str = "trace.json") -> None:
+        self._path = makedirs(dirpath)
+        self.filename, self._file = non_existent(
+            self._path,
+            sequence(filename),
+            lambda p: private(p.open("x", encoding="utf-8")),
+        )
+        self._file.write("[")
+        self._sep = "\n"
+        self._lock = threading.Lock()
+        # process and thread ids of tracks that have been named
+        self._tracks = set()  # type: typing.Set[typing.Tuple[int, int]]
+
+    def pushcontext(self, title: str) -> None:
+        self._event("B", title)
+
+    def popcontext(self) -> None:
+        self._event("E")
+
+    def recontext(self, title: str) -> None:
+        self._event("E")
+        self._event("B", title)
+
+    def write(self, msg, level: Level) -> None:
+        if isinstance(msg, Data):
+            args = {"level": level.name, "type": msg.type, "size": len(msg.data)}
+            self._event("i", msg.name, s="t", args=args)
+        else:
+            self._event("i", msg, s="t", args={"level": level.name})
+
+    def _event(self, ph: str, name: typing.Optional[str] = None, **event) -> None:
+        pid = os.getpid()
+        tid = threading.get_ident()
+        event.update(ph=ph, ts=time.perf_counter_ns() / 1e3, pid=pid, tid=tid)
+        if name is not None:
+            event.update(name=name)
+        with self._lock:
+            if (pid, tid) not in self._tracks:
+                self._tracks.add((pid, tid))
+                self._dump(
+                    name="thread_name",
+                    ph="M",
+                    pid=pid,
+                    tid=tid,
+                    args={"name": threading.current_thread().name},
+                )
+            self._dump(**event)
+
+    def _dump(self, **event) -> None:
+        self._file.write(self._sep + json.dumps(event))
+        self._sep = ",\n"
+
+    def close(self) -> bool:
+        if hasattr(self, "_file") and not self._file.closed:
+            self._file.write("\n]\n")
+            self._file.close()
+            return True
+        else:
+            return False
+
+    def __enter__(self) -> "TraceLog":
+        return self
+
+    def __exit__(
+        self,
+        t: typing.Optional[typing.Type[BaseException]],
+        value: typing.Optional[BaseException],
+        traceback: typing.Optional[types.TracebackType],
+    ) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        if self.close():
+            warnings.warn("unclosed object {!r}".format(self), ResourceWarning)
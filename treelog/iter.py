@@ -1,9 +1,15 @@
+import collections
+import concurrent.futures
+import datetime
 import itertools
+import os
+import time
 import warnings
 import inspect
 import typing
 import types
 from . import _state
+from ._record import RecordLog
 
 T = typing.TypeVar("T")
 T0 = typing.TypeVar("T0")
@@ -24,42 +30,100 @@ class wrap(typing.Generic[T]):
     The wrapped iterable is identical to the original, except that prior to every
     next item a new log context is opened taken from the ``titles`` iterable. The
     wrapped object should be entered before use in order to ensure that this
-    context is properly closed in case the iterator is prematurely abandoned."""
+    context is properly closed in case the iterator is prematurely abandoned.
+
+    If ``throughput`` is true, the number of items per second is tracked as an
+    exponentially smoothed average and made available as :attr:`rate`, along
+    with the estimated number of seconds remaining as :attr:`eta` if the
+    ``length`` of the iterable is given. Both are appended to the context
+    title, updated at most once every :attr:`renderinterval` seconds."""
+
+    # weight of the most recent item in the smoothed duration per item
+    smoothing = 0.3
+    renderinterval = 1.0
 
     def __init__(
         self,
         titles: typing.Union[typing.Iterable[str], typing.Generator[str, T, None]],
         iterable: typing.Iterable[T],
+        *,
+        length: typing.Optional[int] = None,
+        throughput: bool = False,
     ) -> None:
         self._titles = iter(titles)
         self._iterable = iter(iterable)
         self._log = None  # type: typing.Optional[proto.Log]
+        self._task = False  # whether contexts are tracked for the current task
         self._warn = False
+        self._length = length
+        self._throughput = throughput
+        self.rate = None  # type: typing.Optional[float]
+        self.eta = None  # type: typing.Optional[float]
+        self._count = 0  # number of items started
+        self._started = None  # type: typing.Optional[float]
+        self._duration = None  # type: typing.Optional[float]
+        self._rendered = -float("inf")
+        self._suffix = ""
 
     def __enter__(self) -> typing.Iterator[T]:
         if self._log is not None:
             raise Exception("iter.wrap is not reentrant")
-        self._log = _state.current
-        self._log.pushcontext(next(self._titles))
+        self._task = _state._intask()
+        self._enter()
         return iter(self)
 
+    def _enter(self) -> None:
+        if self._task:
+            _state._entertask()
+        self._log = _state.dispatch
+        self._log.pushcontext(next(self._titles))
+
     def __iter__(self) -> typing.Generator[T, None, None]:
         if self._log is not None:
             cansend = inspect.isgenerator(self._titles)
             for value in self._iterable:
-                self._log.recontext(
+                title = (
                     typing.cast(typing.Generator[str, T, None], self._titles).send(
                         value
                     )
                     if cansend
                     else next(self._titles)
                 )
+                if self._throughput:
+                    title += self._measure()
+                self._log.recontext(title)
                 yield value
         else:
             with self:
                 self._warn = True
                 yield from self
 
+    def _measure(self) -> str:
+        """Update rate and eta upon the start of an item, return title suffix."""
+
+        now = time.perf_counter()
+        if self._started is not None:
+            duration = now - self._started
+            if self._duration is None:
+                self._duration = duration
+            else:
+                self._duration += self.smoothing * (duration - self._duration)
+            if self._duration > 0:
+                self.rate = 1 / self._duration
+            if self._length is not None:
+                self.eta = max(self._length - self._count, 0) * self._duration
+            if now - self._rendered >= self.renderinterval and self.rate is not None:
+                self._rendered = now
+                self._suffix = f" ({self.rate:.3g}/s"
+                if self.eta is not None:
+                    self._suffix += (
+                        f", {datetime.timedelta(seconds=round(self.eta))} left"
+                    )
+                self._suffix += ")"
+        self._started = now
+        self._count += 1
+        return self._suffix
+
     def __exit__(
         self,
         exctype: typing.Optional[typing.Type[BaseException]],
@@ -70,8 +134,74 @@ class wrap(typing.Generic[T]):
             raise Exception("iter.wrap has not yet been entered")
         if self._warn and exctype is GeneratorExit:
             warnings.warn("unclosed iter.wrap", ResourceWarning)
-        self._log.popcontext()
-        self._log = None
+        try:
+            self._log.popcontext()
+        finally:
+            self._log = None
+            if self._task:
+                _state._exittask()
+
+
+class awrap(wrap[T]):
+    """Wrap asynchronous iterable in consecutive title contexts.
+
+    Asynchronous counterpart of :class:`wrap`, to be iterated with ``async
+    for`` and entered with ``async with``. As with :func:`treelog.acontext`,
+    the contexts are opened only for the current task, such that concurrent
+    tasks can each iterate in their own branch of the log tree."""
+
+    def __init__(
+        self,
+        titles: typing.Union[typing.Iterable[str], typing.Generator[str, T, None]],
+        iterable: typing.AsyncIterable[T],
+        *,
+        length: typing.Optional[int] = None,
+        throughput: bool = False,
+    ) -> None:
+        super().__init__(titles, (), length=length, throughput=throughput)
+        self._aiterable = iterable.__aiter__()
+
+    def __enter__(self) -> typing.NoReturn:
+        raise TypeError("iter.awrap should be entered with async with")
+
+    def __iter__(self) -> typing.NoReturn:
+        raise TypeError("iter.awrap should be iterated with async for")
+
+    async def __aenter__(self) -> typing.AsyncIterator[T]:
+        if self._log is not None:
+            raise Exception("iter.awrap is not reentrant")
+        self._task = True
+        self._enter()
+        return self.__aiter__()
+
+    async def __aiter__(self) -> typing.AsyncGenerator[T, None]:
+        if self._log is not None:
+            cansend = inspect.isgenerator(self._titles)
+            async for value in self._aiterable:
+                title = (
+                    typing.cast(typing.Generator[str, T, None], self._titles).send(
+                        value
+                    )
+                    if cansend
+                    else next(self._titles)
+                )
+                if self._throughput:
+                    title += self._measure()
+                self._log.recontext(title)
+                yield value
+        else:
+            async with self:
+                self._warn = True
+                async for value in self:
+                    yield value
+
+    async def __aexit__(
+        self,
+        exctype: typing.Optional[typing.Type[BaseException]],
+        excvalue: typing.Optional[BaseException],
+        tb: typing.Optional[types.TracebackType],
+    ) -> None:
+        self.__exit__(exctype, excvalue, tb)
 
 
 @typing.overload
@@ -200,7 +330,11 @@ def plain(title: str, *args: typing.Any) -> wrap[typing.Any]:
 
 @typing.overload
 def fraction(
-    title: str, __arg0: typing.Iterable[T0], *, length: typing.Optional[int] = ...
+    title: str,
+    __arg0: typing.Iterable[T0],
+    *,
+    length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[T0]: ...
 
 
@@ -211,6 +345,7 @@ def fraction(
     __arg1: typing.Iterable[T1],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1]]: ...
 
 
@@ -222,6 +357,7 @@ def fraction(
     __arg2: typing.Iterable[T2],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2]]: ...
 
 
@@ -234,6 +370,7 @@ def fraction(
     __arg3: typing.Iterable[T3],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3]]: ...
 
 
@@ -247,6 +384,7 @@ def fraction(
     __arg4: typing.Iterable[T4],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3, T4]]: ...
 
 
@@ -261,6 +399,7 @@ def fraction(
     __arg5: typing.Iterable[T5],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3, T4, T5]]: ...
 
 
@@ -276,6 +415,7 @@ def fraction(
     __arg6: typing.Iterable[T6],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3, T4, T5, T6]]: ...
 
 
@@ -292,6 +432,7 @@ def fraction(
     __arg7: typing.Iterable[T7],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3, T4, T5, T6, T7]]: ...
 
 
@@ -309,6 +450,7 @@ def fraction(
     __arg8: typing.Iterable[T8],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3, T4, T5, T6, T7, T8]]: ...
 
 
@@ -327,32 +469,49 @@ def fraction(
     __arg9: typing.Iterable[T9],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3, T4, T5, T6, T7, T8, T9]]: ...
 
 
 @typing.overload
 def fraction(
-    title: str, *args: typing.Any, length: typing.Optional[int] = ...
+    title: str,
+    *args: typing.Any,
+    length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Any]: ...
 
 
 def fraction(
-    title: str, *args: typing.Any, length: typing.Optional[int] = None
+    title: str,
+    *args: typing.Any,
+    length: typing.Optional[int] = None,
+    throughput: bool = False,
 ) -> wrap[typing.Any]:
     """Wrap arguments in enumerated contexts with length.
 
-    Example: my context 1/5, my context 2/5, etc.
+    Example: my context 1/5, my context 2/5, etc. See :class:`wrap` for the
+    ``throughput`` argument.
     """
 
     if length is None:
         length = min(len(arg) for arg in args)
     titles = map((_escape(title) + " {}/" + str(length)).format, itertools.count())
-    return wrap(titles, zip(*args) if len(args) > 1 else args[0])
+    return wrap(
+        titles,
+        zip(*args) if len(args) > 1 else args[0],
+        length=length,
+        throughput=throughput,
+    )
 
 
 @typing.overload
 def percentage(
-    title: str, __arg0: typing.Iterable[T0], *, length: typing.Optional[int] = ...
+    title: str,
+    __arg0: typing.Iterable[T0],
+    *,
+    length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[T0]: ...
 
 
@@ -363,6 +522,7 @@ def percentage(
     __arg1: typing.Iterable[T1],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1]]: ...
 
 
@@ -374,6 +534,7 @@ def percentage(
     __arg2: typing.Iterable[T2],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2]]: ...
 
 
@@ -386,6 +547,7 @@ def percentage(
     __arg3: typing.Iterable[T3],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3]]: ...
 
 
@@ -399,6 +561,7 @@ def percentage(
     __arg4: typing.Iterable[T4],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3, T4]]: ...
 
 
@@ -413,6 +576,7 @@ def percentage(
     __arg5: typing.Iterable[T5],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3, T4, T5]]: ...
 
 
@@ -428,6 +592,7 @@ def percentage(
     __arg6: typing.Iterable[T6],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3, T4, T5, T6]]: ...
 
 
@@ -444,6 +609,7 @@ def percentage(
     __arg7: typing.Iterable[T7],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3, T4, T5, T6, T7]]: ...
 
 
@@ -461,6 +627,7 @@ def percentage(
     __arg8: typing.Iterable[T8],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3, T4, T5, T6, T7, T8]]: ...
 
 
@@ -479,21 +646,29 @@ def percentage(
     __arg9: typing.Iterable[T9],
     *,
     length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Tuple[T0, T1, T2, T3, T4, T5, T6, T7, T8, T9]]: ...
 
 
 @typing.overload
 def percentage(
-    title: str, *args: typing.Any, length: typing.Optional[int] = ...
+    title: str,
+    *args: typing.Any,
+    length: typing.Optional[int] = ...,
+    throughput: bool = ...,
 ) -> wrap[typing.Any]: ...
 
 
 def percentage(
-    title: str, *args: typing.Any, length: typing.Optional[int] = None
+    title: str,
+    *args: typing.Any,
+    length: typing.Optional[int] = None,
+    throughput: bool = False,
 ) -> wrap[typing.Any]:
     """Wrap arguments in contexts with percentage counter.
 
-    Example: my context 5%, my context 10%, etc.
+    Example: my context 5%, my context 10%, etc. See :class:`wrap` for the
+    ``throughput`` argument.
     """
 
     if length is None:
@@ -505,7 +680,132 @@ def percentage(
         )
     else:
         titles = (title + " 100%",)
-    return wrap(titles, zip(*args) if len(args) > 1 else args[0])
+    return wrap(
+        titles,
+        zip(*args) if len(args) > 1 else args[0],
+        length=length,
+        throughput=throughput,
+    )
+
+
+def afraction(
+    title: str,
+    iterable: typing.AsyncIterable[T],
+    *,
+    length: typing.Optional[int] = None,
+    throughput: bool = False,
+) -> awrap[T]:
+    """Wrap asynchronous iterable in enumerated contexts with length.
+
+    Asynchronous counterpart of :func:`fraction`. If ``length`` is not given,
+    the iterable should support :func:`len`."""
+
+    if length is None:
+        length = len(iterable)  # type: ignore
+    titles = map((_escape(title) + " {}/" + str(length)).format, itertools.count())
+    return awrap(titles, iterable, length=length, throughput=throughput)
+
+
+def apercentage(
+    title: str,
+    iterable: typing.AsyncIterable[T],
+    *,
+    length: typing.Optional[int] = None,
+    throughput: bool = False,
+) -> awrap[T]:
+    """Wrap asynchronous iterable in contexts with percentage counter.
+
+    Asynchronous counterpart of :func:`percentage`. If ``length`` is not given,
+    the iterable should support :func:`len`."""
+
+    if length is None:
+        length = len(iterable)  # type: ignore
+    if length:
+        # type: typing.Iterable[str]
+        titles = map(
+            (_escape(title) + " {:.0f}%").format, itertools.count(step=100 / length)
+        )
+    else:
+        titles = (title + " 100%",)
+    return awrap(titles, iterable, length=length, throughput=throughput)
+
+
+def pmap(
+    title: str,
+    func: typing.Callable[..., T],
+    *args: typing.Iterable[typing.Any],
+    executor: concurrent.futures.Executor,
+    length: typing.Optional[int] = None,
+    maxinflight: typing.Optional[int] = None,
+) -> typing.Generator[T, None, None]:
+    """Map function over arguments in parallel, in enumerated contexts.
+
+    Every item, or tuple of items if several iterables are given, is submitted
+    to the executor, which can be a thread or a process pool. The log of every
+    call is recorded and replayed in a context as created by :func:`fraction`,
+    after which the result is yielded, in input order and as soon as all
+    preceding calls are done. The resulting log is therefore identical to
+    that of mapping the function serially:
+
+    >>> import treelog, concurrent.futures
+    >>> def square(n):
+    ...   treelog.info(f'squaring {n}')
+    ...   return n**2
+    >>> with concurrent.futures.ThreadPoolExecutor() as executor:
+    ...   list(treelog.iter.pmap('item', square, range(2), executor=executor))
+    item 1/2 > squaring 0
+    item 2/2 > squaring 1
+    [0, 1]
+
+    If ``length`` is not given, the iterables should support :func:`len`. At
+    most ``maxinflight`` calls, by default twice the number of CPUs, are
+    submitted ahead of the item that is yielded next, such that the iterables
+    are consumed as the results are, and memory use does not grow with their
+    length. The function and arguments should be picklable for process pools.
+    Exceptions are raised after replaying the log of the failing call."""
+
+    if length is None:
+        length = min(len(arg) for arg in args)  # type: ignore
+    if maxinflight is None:
+        maxinflight = 2 * (os.cpu_count() or 1)
+    items = zip(*args)
+    titles = map((_escape(title) + " {}/" + str(length)).format, itertools.count())
+    with _state._localmode():
+        futures = collections.deque(
+            executor.submit(_call, func, *item)
+            for item in itertools.islice(items, maxinflight)
+        )
+        log = _state.dispatch
+        log.pushcontext(next(titles))
+        try:
+            while futures:
+                record, result, exc = futures[0].result()
+                futures.popleft()
+                for item in itertools.islice(items, 1):
+                    futures.append(executor.submit(_call, func, *item))
+                log.recontext(next(titles))
+                record.replay(log)
+                del record
+                if exc is not None:
+                    raise exc
+                yield result
+        finally:
+            for future in futures:
+                future.cancel()
+            log.popcontext()
+
+
+def _call(
+    func: typing.Callable[..., T], *args: typing.Any
+) -> typing.Tuple[RecordLog, typing.Optional[T], typing.Optional[Exception]]:
+    """Call function with the log captured in a record."""
+
+    record = RecordLog()
+    with _state._capture(record):
+        try:
+            return record, func(*args), None
+        except Exception as e:
+            return record, None, e
 
 
 def _escape(s: str) -> str:
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from enum import Enum
-from typing import Protocol, Union, Optional
+from typing import BinaryIO, ContextManager, Optional, Protocol, Union
 
 
 class Level(Enum):
@@ -33,3 +33,16 @@ class Log(Protocol):
     def popcontext(self) -> None: ...
     def recontext(self, title: str) -> None: ...
     def write(self, msg: Union[str, Data], level: Level) -> None: ...
+
+
+class FileLog(Log, Protocol):
+    """Log that accepts data as a stream.
+
+    Implementing :meth:`openfile` is optional. It returns a context manager
+    that yields a writable binary file, the contents of which are taken as a
+    :class:`Data` object upon successful exit. Logs that do not implement it
+    receive the data via :meth:`Log.write` after it has been buffered."""
+
+    def openfile(
+        self, name: str, level: Level, type: Optional[str] = None
+    ) -> ContextManager[BinaryIO]: ...